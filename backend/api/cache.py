@@ -0,0 +1,75 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.metrics import registry
+from recipes.versions import get_versions
+
+FILTER_PARAMS = ('author', 'is_favorited', 'is_in_shopping_cart', 'page',
+                 'limit', 'cursor', 'search')
+
+
+class RecipeListCache:
+    """Кеш анонимной выдачи списка рецептов.
+
+    Ключ строится из нормализованных параметров ``RecipeFilter`` и меток
+    семейств ``recipes:tag:<slug>``, ``recipes:author:<id>`` и
+    ``recipes:all``. Изменение рецепта обновляет только метки его тегов,
+    автора и ``recipes:all`` (см. ``recipes.signals``), поэтому остальные
+    записи остаются действительными.
+
+    Попадания и промахи считаются в метриках процесса, а не в кеше:
+    ``incr`` файлового и database-кеша не атомарен и теряет увеличения.
+    Сумма по всем воркерам видна только с ``METRICS_DIR``.
+    """
+    prefix = 'recipes:list'
+
+    def key(self, request):
+        params = request.query_params
+        tags = sorted(set(params.getlist('tags')))
+        normalized = {name: params.get(name, '') for name in FILTER_PARAMS}
+        families = ['recipes:catalog']
+        families.extend(f'recipes:tag:{slug}' for slug in tags)
+        if normalized['author']:
+            families.append(f'recipes:author:{normalized["author"]}')
+        if not tags and not normalized['author']:
+            families.append('recipes:all')
+        payload = json.dumps(
+            [request.get_host(), tags, normalized, get_versions(families)],
+            sort_keys=True,
+        )
+        return f'{self.prefix}:{hashlib.md5(payload.encode()).hexdigest()}'
+
+    def get(self, key):
+        data = cache.get(key)
+        (hits if data is not None else misses).inc()
+        return data
+
+    def set(self, key, data):
+        cache.set(key, data, timeout=settings.RECIPE_LIST_CACHE_TIMEOUT)
+
+    def stats(self):
+        hit_count = hits.value()
+        miss_count = misses.value()
+        total = hit_count + miss_count
+        return {
+            'hits': hit_count,
+            'misses': miss_count,
+            'hit_ratio': hit_count / total if total else 0.0,
+        }
+
+
+hits = registry.counter(
+    'recipe_list_cache_hits', 'Попадания в кеш анонимного списка рецептов'
+)
+misses = registry.counter(
+    'recipe_list_cache_misses', 'Промахи кеша анонимного списка рецептов'
+)
+recipe_list_cache = RecipeListCache()
+registry.gauge(
+    'recipe_list_cache_hit_ratio',
+    'Доля попаданий в кеш анонимного списка рецептов',
+    lambda: recipe_list_cache.stats()['hit_ratio'],
+)
@@ -1,14 +1,74 @@
-from django_filters.rest_framework import (AllValuesMultipleFilter, FilterSet,
-                                           NumberFilter)
+from django import forms
+from django_filters.rest_framework import Filter, FilterSet, NumberFilter
+from recipes.fulltext import search_recipes
 from recipes.models import Recipe
+from recipes.search import ingredient_index
+from recipes.tags import filter_by_tags
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+
+class IngredientSearchFilter(BaseFilterBackend):
+    """Поиск ингредиентов для автодополнения.
+
+    Для списка возвращает не больше INGREDIENT_SEARCH_LIMIT записей:
+    сначала совпадения по началу названия, потом по вхождению. Поиск идёт
+    по индексу в памяти воркера, без запроса к базе.
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query or getattr(view, 'action', None) != 'list':
+            return queryset
+        return ingredient_index.search(query)
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """Полнотекстовый поиск ``?search=`` по списку рецептов.
+
+    Результаты упорядочены по релевантности: название важнее
+    ингредиентов, ингредиенты важнее описания. Курсорная пагинация
+    упорядочивает по id, поэтому вместе с поиском не допускается.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query or getattr(view, 'action', None) != 'list':
+            return queryset
+        cursor_param = getattr(view.paginator, 'cursor_query_param', None)
+        if cursor_param in request.query_params:
+            raise ValidationError({
+                cursor_param: 'Поиск не совмещается с курсорной '
+                              'пагинацией: используйте page.'
+            })
+        return search_recipes(queryset, query)
+
+
+class SlugListField(forms.Field):
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        return [slug for slug in value or () if slug]
+
+
+class TagsFilter(Filter):
+    """Фильтр по slug тегов без выборки вариантов из базы."""
+    field_class = SlugListField
+
+    def filter(self, queryset, value):
+        if not value:
+            return queryset
+        return filter_by_tags(queryset, value)
 
 
 class RecipeFilter(FilterSet):
     is_favorited = NumberFilter(
         method='get_is_favorited',
     )
-    tags = AllValuesMultipleFilter(
-        field_name='tags__slug',
+    tags = TagsFilter(
         label='tags',
     )
     is_in_shopping_cart = NumberFilter(
@@ -0,0 +1,186 @@
+import json
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.test import APIClient
+
+from api.middleware import QueryStats
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+BUDGETS = settings.BASE_DIR / 'data' / 'benchmark_budgets.json'
+INGREDIENTS = settings.BASE_DIR / 'data' / 'ingredients.csv'
+
+
+def percentile(values, rank):
+    values = sorted(values)
+    return values[max(math.ceil(rank / 100 * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер основных эндпоинтов API на сгенерированных данных '
+        'и сравнение с бюджетами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=30,
+            help='Сколько раз выполнять каждый запрос',
+        )
+        parser.add_argument(
+            '--budgets',
+            default=str(BUDGETS),
+            help='JSON с бюджетами по запросам',
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Не удалять тестовую базу после замера',
+        )
+
+    def handle(self, *args, **options):
+        with open(options['budgets'], encoding='utf-8') as file:
+            budgets = json.load(file)
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        try:
+            cache.clear()
+            self.generate(options)
+            results = {
+                name: self.measure(request, options['iterations'])
+                for name, request in self.get_scenarios().items()
+            }
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+
+        failures = []
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<24} p50 {result["p50_ms"]:7.1f} ms  '
+                f'p95 {result["p95_ms"]:7.1f} ms  '
+                f'p99 {result["p99_ms"]:7.1f} ms  '
+                f'queries {result["queries"]:3}  '
+                f'sql {result["sql_ms"]:6.1f} ms'
+            )
+            for metric, limit in budgets.get(name, {}).items():
+                if result[metric] > limit:
+                    failures.append(
+                        f'{name}: {metric} {result[metric]:g} > {limit:g}'
+                    )
+        if failures:
+            raise CommandError(
+                'Превышены бюджеты:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('All budgets met'))
+
+    def generate(self, options):
+        users, recipes = options['users'], options['recipes']
+        call_command('import_csv', path=str(INGREDIENTS), stdout=self.stdout)
+        call_command(
+            'generate_data',
+            users=users,
+            recipes=recipes,
+            follows=users * 10,
+            favorites=recipes * 5,
+            carts=users * 5,
+            seed=options['seed'],
+            stdout=self.stdout,
+        )
+        call_command('build_similarity', full=True, stdout=self.stdout)
+
+    def get_scenarios(self):
+        user = User.objects.annotate(
+            follows=Count('follower', distinct=True),
+            carts=Count('shopping_cart', distinct=True),
+        ).order_by('-follows', '-carts').first()
+        client = APIClient()
+        client.force_authenticate(user)
+        recipe_ids = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)[:100]
+        )
+        recipe_ids = iter(recipe_ids * 100)
+        pantry = '&'.join(
+            f'ingredients={pk}' for pk in Ingredient.objects.annotate(
+                uses=Count('ingredients')
+            ).order_by('-uses').values_list('id', flat=True)[:10]
+        )
+        return {
+            'recipe_list': lambda: client.get('/api/recipes/?limit=24'),
+            'recipe_list_by_tag': lambda: client.get(
+                '/api/recipes/?tags=breakfast&tags=lunch&limit=24'
+            ),
+            'recipe_search': lambda: client.get(
+                '/api/recipes/?search=соль&limit=24'
+            ),
+            'recipe_by_ingredients': lambda: client.get(
+                f'/api/recipes/by-ingredients/?{pantry}&limit=24'
+            ),
+            'recipe_detail': lambda: client.get(
+                f'/api/recipes/{next(recipe_ids)}/'
+            ),
+            'recipe_feed': lambda: client.get('/api/recipes/feed/?limit=24'),
+            'recipe_similar': lambda: client.get(
+                f'/api/recipes/{next(recipe_ids)}/similar/?limit=6'
+            ),
+            'recipe_recommended': lambda: client.get(
+                '/api/recipes/recommended/?limit=24'
+            ),
+            'subscriptions': lambda: client.get(
+                '/api/users/subscriptions/?limit=6&recipes_limit=3'
+            ),
+            'download_shopping_cart': lambda: client.get(
+                '/api/recipes/download_shopping_cart/?format=txt'
+            ),
+            'ingredient_search': lambda: client.get(
+                '/api/ingredients/?name=сах'
+            ),
+        }
+
+    def measure(self, request, iterations):
+        """Время ответа по перцентилям и SQL последнего прогона.
+
+        Время SQL меряется обёрткой ``QueryStats`` через perf_counter:
+        ``CaptureQueriesContext`` округляет его до миллисекунд.
+        """
+        durations = []
+        for _ in range(iterations + 1):
+            queries = QueryStats(slow_ms=math.inf)
+            with connection.execute_wrapper(queries):
+                started = time.perf_counter()
+                response = request()
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                durations.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{response.request["PATH_INFO"]}: '
+                    f'HTTP {response.status_code}'
+                )
+        durations = durations[1:]
+        return {
+            'p50_ms': percentile(durations, 50),
+            'p95_ms': percentile(durations, 95),
+            'p99_ms': percentile(durations, 99),
+            'queries': queries.count,
+            'sql_ms': queries.duration,
+        }
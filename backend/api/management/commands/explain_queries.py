@@ -0,0 +1,129 @@
+import re
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.http import QueryDict
+
+from api.filters import RecipeFilter
+from api.utils import get_shopping_list
+from recipes.feed import get_feed
+from recipes.models import Recipe, Tag
+from users.models import Follow, User
+
+# Справочники из десятков строк дешевле прочитать целиком.
+SMALL_TABLES = {Tag._meta.db_table}
+
+SEQ_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)'),
+}
+# SQLite обходит таблицу в порядке rowid без сортировки и останавливается
+# на LIMIT: это аналог Index Scan Backward по первичному ключу.
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+INDEX_ONLY = {
+    'postgresql': re.compile(r'Index Only Scan'),
+    'sqlite': re.compile(r'USING COVERING INDEX'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN для основных запросов API с отчётом о '
+        'последовательных сканированиях'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='EXPLAIN ANALYZE (только PostgreSQL)',
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Печатать планы целиком',
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Ошибка, если есть последовательные сканирования',
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in SEQ_SCAN:
+            raise CommandError(f'Неподдерживаемая база: {vendor}')
+        explain_options = {}
+        if options['analyze'] and vendor == 'postgresql':
+            explain_options['analyze'] = True
+        user = User.objects.annotate(
+            favorites=Count('favorite_list')
+        ).order_by('-favorites').first()
+        if user is None:
+            raise CommandError('Нет данных: выполните generate_data')
+
+        offenders = []
+        for name, queryset in self.get_queries(user).items():
+            plan = queryset.explain(**explain_options)
+            scans = {
+                table for table in SEQ_SCAN[vendor].findall(plan)
+                if table not in SMALL_TABLES
+            }
+            ordered = set()
+            if (vendor == 'sqlite' and queryset.query.high_mark is not None
+                    and not TEMP_SORT.search(plan)):
+                ordered, scans = scans, set()
+            index_only = len(INDEX_ONLY[vendor].findall(plan))
+            style = self.style.ERROR if scans else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name:<22} seq scans: {", ".join(sorted(scans)) or "-"}; '
+                f'ordered scans: {", ".join(sorted(ordered)) or "-"}; '
+                f'index-only scans: {index_only}'
+            ))
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+            if scans:
+                offenders.append(name)
+        if offenders and options['strict']:
+            raise CommandError(
+                'Последовательные сканирования: ' + ', '.join(offenders)
+            )
+
+    def get_queries(self, user):
+        request = SimpleNamespace(user=user)
+        recipes = Recipe.objects.read_plan(user)
+        slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+        author = Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        ).first() or user.pk
+
+        def filtered(**params):
+            data = QueryDict(mutable=True)
+            for key, value in params.items():
+                data.setlist(key, value if isinstance(value, list)
+                             else [value])
+            return RecipeFilter(data, recipes, request=request).qs[:24]
+
+        return {
+            'recipe_list': recipes[:24],
+            'recipe_list_by_tags': filtered(tags=slugs),
+            'recipe_list_by_author': filtered(author=author),
+            'favorited': filtered(is_favorited=1),
+            'not_favorited': filtered(is_favorited=0),
+            'in_shopping_cart': filtered(is_in_shopping_cart=1),
+            'not_in_shopping_cart': filtered(is_in_shopping_cart=0),
+            'recipe_detail': recipes.filter(pk=Recipe.objects.first().pk),
+            'feed': get_feed(user)[:24],
+            'subscriptions': User.objects.filter(
+                pk__in=user.follower.values('author__id')
+            ).order_by('id')[:6],
+            'author_recipes': Recipe.objects.minified().filter(
+                author_id=author
+            ).order_by('-id')[:3],
+            'author_followers': Follow.objects.filter(
+                author_id=author
+            ).values_list('user_id', flat=True),
+            'shopping_list': get_shopping_list(user),
+        }
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import recipe_list_cache
+
+
+class Command(BaseCommand):
+    help = ('Статистика кеша анонимного списка рецептов; счётчики воркеров '
+            'видны только с METRICS_DIR')
+
+    def handle(self, *args, **options):
+        stats = recipe_list_cache.stats()
+        self.stdout.write(
+            f'hits: {stats["hits"]}, misses: {stats["misses"]}, '
+            f'hit ratio: {stats["hit_ratio"]:.2%}'
+        )
@@ -0,0 +1,134 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from recipes.metrics import COUNT_BUCKETS, registry
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LATENCY = registry.histogram(
+    'api_request_duration_seconds', 'Время ответа по view и методу'
+)
+REQUEST_QUERIES = registry.histogram(
+    'api_request_db_queries', 'Число SQL-запросов на ответ', COUNT_BUCKETS
+)
+REQUEST_DB_TIME = registry.histogram(
+    'api_request_db_duration_seconds', 'Время SQL-запросов на ответ'
+)
+
+PLACEHOLDERS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    """SQL без значений: одинаковые запросы с разными id совпадают."""
+    return LITERALS.sub('?', PLACEHOLDERS.sub('(...)', sql))
+
+
+class QueryStats:
+    """Обёртка для ``connection.execute_wrapper``, считающая запросы."""
+
+    def __init__(self, slow_ms):
+        self.slow_ms = slow_ms
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.count += 1
+            self.duration += duration
+            self.fingerprints[fingerprint(sql)] += 1
+            if duration >= self.slow_ms:
+                self.slow.append((duration, sql))
+
+    @property
+    def duplicates(self):
+        return sum(n - 1 for n in self.fingerprints.values() if n > 1)
+
+
+class QueryInstrumentationMiddleware:
+    """Число запросов и время БД на каждый запрос к приложению.
+
+    Итог попадает в заголовок ``Server-Timing`` и гистограммы метрик;
+    медленные запросы всегда пишутся в лог с уровнем WARNING, а строка
+    для доли запросов ``SQL_LOG_SAMPLE_RATE`` — с уровнем DEBUG, то есть
+    только при ``SQL_LOG_LEVEL=DEBUG``.
+    Для потоковых ответов подсчёт продолжается до конца отдачи, но в
+    заголовок попадает только то, что выполнено до его отправки.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats(settings.SLOW_QUERY_MS)
+        started = time.perf_counter()
+        with self.instrument(stats):
+            response = self.get_response(request)
+        response['Server-Timing'] = (
+            f'db;dur={stats.duration:.1f};desc="{stats.count} queries", '
+            f'app;dur={(time.perf_counter() - started) * 1000:.1f}'
+        )
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, stats, started
+            )
+        else:
+            self.report(request, response, stats, started)
+        return response
+
+    @staticmethod
+    def instrument(stats):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        return stack
+
+    def stream(self, content, request, response, stats, started):
+        with self.instrument(stats):
+            yield from content
+        self.report(request, response, stats, started)
+
+    def report(self, request, response, stats, started):
+        match = request.resolver_match
+        view = match.view_name if match else None
+        elapsed = time.perf_counter() - started
+        labels = {'view': view or 'unmatched', 'method': request.method}
+        REQUEST_LATENCY.observe(elapsed, **labels)
+        REQUEST_QUERIES.observe(stats.count, **labels)
+        REQUEST_DB_TIME.observe(stats.duration / 1000, **labels)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': stats.count,
+            'db_ms': round(stats.duration, 1),
+            'total_ms': round(elapsed * 1000, 1),
+            'duplicates': stats.duplicates,
+        }
+        for duration, sql in stats.slow:
+            logger.warning(json.dumps(
+                {**record, 'slow_ms': round(duration, 1), 'sql': sql[:1000]},
+                ensure_ascii=False,
+            ))
+        if (not logger.isEnabledFor(logging.DEBUG)
+                or random.random() >= settings.SQL_LOG_SAMPLE_RATE):
+            return
+        if stats.duplicates:
+            sql, count = stats.fingerprints.most_common(1)[0]
+            record['top_duplicate'] = {'sql': sql[:500], 'count': count}
+        logger.debug(json.dumps(record, ensure_ascii=False))
@@ -1,7 +1,35 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class LimitCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 24
+    ordering = '-id'
 
 
 class PageLimitPagination(PageNumberPagination):
+    """Постраничная выдача с параметром ``limit``.
+
+    Если в запросе есть ``cursor`` (в том числе пустой), используется
+    курсорная пагинация по ``-id``: без COUNT(*) и OFFSET.
+    """
     page_size = 6
     page_size_query_param = 'limit'
-    max_page_size = 24
\ No newline at end of file
+    max_page_size = 24
+    cursor_query_param = 'cursor'
+    cursor_pagination_class = LimitCursorPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,199 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Потоковый рендерер списка покупок.
+
+    Метод ``stream`` получает ленивую последовательность строк
+    ``get_shopping_list`` и отдаёт файл по частям.
+    """
+    charset = 'utf-8'
+    extension = None
+
+    def render(self, data, media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return json.dumps(data, ensure_ascii=False).encode('utf-8')
+        return b''.join(self.stream(data))
+
+    def stream(self, items):
+        raise NotImplementedError
+
+    def get_filename(self):
+        return f'list.{self.extension or self.format}'
+
+
+class PlainTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, items):
+        for item in items:
+            yield (
+                f'{item["name"]} ({item["measurement_unit"]})'
+                f' — {item["total"]} \n'
+            ).encode(self.charset)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ингредиент', 'Единица измерения', 'Количество')
+
+    def stream(self, items):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.header).encode(self.charset)
+        for item in items:
+            yield writer.writerow(
+                (item['name'], item['measurement_unit'], item['total'])
+            ).encode(self.charset)
+
+
+class JSONLinesRenderer(ShoppingListRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'json'
+    extension = 'jsonl'
+
+    def stream(self, items):
+        for item in items:
+            line = json.dumps(
+                {
+                    'name': item['name'],
+                    'measurement_unit': item['measurement_unit'],
+                    'amount': item['total'],
+                },
+                ensure_ascii=False,
+            )
+            yield f'{line}\n'.encode(self.charset)
+
+
+def _cyrillic_glyphs():
+    # Кириллица в позициях cp1251 через имена глифов Adobe (afii100xx),
+    # чтобы обойтись стандартным шрифтом Helvetica без встраивания.
+    glyphs = {0xA8: 'afii10023', 0xB8: 'afii10071'}
+    for index in range(32):
+        offset = index if index < 6 else index + 1
+        glyphs[0xC0 + index] = f'afii{10017 + offset}'
+        glyphs[0xE0 + index] = f'afii{10065 + offset}'
+    differences = []
+    previous = None
+    for code in sorted(glyphs):
+        if previous is None or code != previous + 1:
+            differences.append(str(code))
+        differences.append(f'/{glyphs[code]}')
+        previous = code
+    return ' '.join(differences)
+
+
+class PDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    title = 'Список покупок'
+    lines_per_page = 48
+    font_size = 12
+    leading = 16
+    page_size = (595, 842)
+    margin = 50
+    font = (
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica'
+        ' /Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding'
+        f' /Differences [{_cyrillic_glyphs()}] >> >>'
+    )
+
+    @staticmethod
+    def _text(value):
+        value = value.encode('cp1251', errors='replace')
+        for char in (b'\\', b'(', b')'):
+            value = value.replace(char, b'\\' + char)
+        return b'(' + value + b') Tj T*\n'
+
+    def _page(self, lines):
+        width, height = self.page_size
+        return (
+            f'BT /F1 {self.font_size} Tf {self.leading} TL'
+            f' {self.margin} {height - self.margin} Td\n'
+        ).encode('ascii') + b''.join(map(self._text, lines)) + b'ET'
+
+    def stream(self, items):
+        # Объекты 1-3 (каталог, дерево страниц, шрифт) пишутся в конце,
+        # когда известен список страниц, страницы начинаются с номера 4.
+        offsets = {}
+        position = 0
+        pages = []
+
+        def write(number, body):
+            nonlocal position
+            offsets[number] = position
+            chunk = f'{number} 0 obj\n'.encode('ascii') + body + (
+                b'\nendobj\n'
+            )
+            position += len(chunk)
+            return chunk
+
+        def write_page(lines):
+            content = self._page(lines)
+            number = 4 + 2 * len(pages)
+            pages.append(number + 1)
+            width, height = self.page_size
+            return write(
+                number,
+                f'<< /Length {len(content)} >>\nstream\n'.encode('ascii')
+                + content + b'\nendstream'
+            ) + write(
+                number + 1,
+                (
+                    '<< /Type /Page /Parent 2 0 R'
+                    f' /MediaBox [0 0 {width} {height}]'
+                    ' /Resources << /Font << /F1 3 0 R >> >>'
+                    f' /Contents {number} 0 R >>'
+                ).encode('ascii')
+            )
+
+        header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        position = len(header)
+        yield header
+        lines = [self.title, '']
+        for item in items:
+            lines.append(
+                f'{item["name"]} ({item["measurement_unit"]})'
+                f' — {item["total"]}'
+            )
+            if len(lines) == self.lines_per_page:
+                yield write_page(lines)
+                lines = []
+        if lines or not pages:
+            yield write_page(lines)
+        kids = ' '.join(f'{number} 0 R' for number in pages)
+        yield write(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        yield write(
+            2,
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'
+            .encode('ascii')
+        )
+        yield write(3, self.font.encode('ascii'))
+        size = len(offsets) + 1
+        xref = [f'xref\n0 {size}\n', '0000000000 65535 f \n']
+        xref.extend(
+            f'{offsets[number]:010d} 00000 n \n' for number in range(1, size)
+        )
+        xref.append(
+            f'trailer\n<< /Size {size} /Root 1 0 R >>\n'
+            f'startxref\n{position}\n%%EOF\n'
+        )
+        yield ''.join(xref).encode('ascii')
+
+
+SHOPPING_LIST_RENDERERS = (
+    PlainTextRenderer,
+    CSVRenderer,
+    JSONLinesRenderer,
+    PDFRenderer,
+)
@@ -7,9 +7,31 @@ from rest_framework.validators import UniqueValidator
 
 from recipes.models import (Favorite, Ingredient, IngredientsInRecipe, Recipe,
                             ShoppingCart, Tag)
+from recipes.thumbnails import derivative_urls
 from users.serializers import CustomUserSerializer
 
 
+class ImageDerivativesField(serializers.Field):
+    """Ссылки на уменьшенные копии изображения рецепта."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', '*')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        urls = derivative_urls(recipe)
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return {
+            size: request.build_absolute_uri(url)
+            for size, url in urls.items()
+        }
+
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -40,6 +62,7 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
 
 class RecipeRetrieveSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    images = ImageDerivativesField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     tags = TagSerializer(many=True)
@@ -48,7 +71,11 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date',)
+        fields = (
+            'id', 'image', 'images', 'is_favorited', 'is_in_shopping_cart',
+            'tags', 'ingredients', 'author', 'name', 'text', 'cooking_time',
+            'favorites_count',
+        )
 
     def validator(self, obj, model):
         result = False
@@ -58,9 +85,13 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
         return result
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'favorited'):
+            return obj.favorited
         return self.validator(obj, Favorite)
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'in_shopping_cart'):
+            return obj.in_shopping_cart
         return self.validator(obj, ShoppingCart)
 
     def get_ingredients(self, obj):
@@ -72,12 +103,51 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     image = Base64ImageField(read_only=True)
+    images = ImageDerivativesField()
     name = serializers.ReadOnlyField()
     cooking_time = serializers.ReadOnlyField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+
+class RecipeMatchSerializer(RecipeRetrieveSerializer):
+    matched = serializers.IntegerField()
+    missing = serializers.IntegerField()
+    coverage = serializers.SerializerMethodField()
+
+    class Meta(RecipeRetrieveSerializer.Meta):
+        fields = RecipeRetrieveSerializer.Meta.fields + (
+            'matched', 'missing', 'coverage'
+        )
+
+    def get_coverage(self, obj):
+        return round(obj.matched / (obj.matched + obj.missing), 2)
+
+
+class RecipeLimitParamsSerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=24, default=6)
+
+
+class RecipeMatchParamsSerializer(RecipeLimitParamsSerializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
 
 
 class IngredientsListingSerializer(serializers.ModelSerializer):
@@ -185,4 +255,5 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = Recipe.objects.read_plan(request.user).get(pk=instance.pk)
         return RecipeRetrieveSerializer(instance, context=context).data
@@ -0,0 +1,436 @@
+import tempfile
+import threading
+from io import BytesIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Max
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.cache import recipe_list_cache
+from recipes.changes import ChangeLog
+from recipes.fulltext import reindex
+from recipes.thumbnails import build_derivatives
+from recipes.models import (Favorite, Ingredient, IngredientsInRecipe, Recipe,
+                            ShoppingCart)
+from users.models import Follow, User
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@foodgram.ru',
+        first_name=username,
+        last_name=username,
+        password='password',
+    )
+
+
+def create_recipes(author, count, ingredients):
+    # Явные id: на SQLite bulk_create не возвращает первичные ключи.
+    start = (Recipe.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            id=start + number,
+            author=author,
+            name=f'Рецепт {start + number}',
+            text='Описание',
+            cooking_time=10,
+            image='recipes/images/test.png',
+        )
+        for number in range(count)
+    )
+    IngredientsInRecipe.objects.bulk_create(
+        IngredientsInRecipe(recipe=recipe, ingredient=ingredient, amount=10)
+        for recipe in recipes
+        for ingredient in ingredients
+    )
+    return recipes
+
+
+class DownloadShoppingCartTests(TestCase):
+    """Список покупок собирается одним запросом при любом размере корзины."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(5)
+        ]
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        for size in (1, 50, 500):
+            with self.subTest(size=size):
+                user = create_user(f'buyer{size}')
+                ShoppingCart.objects.bulk_create(
+                    ShoppingCart(user=user, recipe=recipe)
+                    for recipe in create_recipes(
+                        user, size, self.ingredients
+                    )
+                )
+                client = APIClient()
+                client.force_authenticate(user)
+                with self.assertNumQueries(1):
+                    response = client.get(
+                        '/api/recipes/download_shopping_cart/?format=txt'
+                    )
+                    content = b''.join(response.streaming_content).decode()
+                self.assertEqual(response.status_code, 200)
+                for ingredient in self.ingredients:
+                    self.assertIn(
+                        f'{ingredient.name} (г) — {size * 10}', content
+                    )
+
+    def test_empty_cart_returns_json_404(self):
+        client = APIClient()
+        client.force_authenticate(create_user('empty'))
+        for extension in ('txt', 'csv', 'pdf'):
+            with self.subTest(format=extension):
+                response = client.get(
+                    f'/api/recipes/download_shopping_cart/?format={extension}'
+                )
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIn('detail', response.json())
+
+
+class RecipeListQueryTests(TestCase):
+    """Флаги в списке рецептов считаются в основном запросе страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.followed = create_user('followed')
+        cls.other = create_user('other')
+        ingredients = [
+            Ingredient.objects.create(name='Соль', measurement_unit='г')
+        ]
+        recipes = (
+            create_recipes(cls.followed, 15, ingredients)
+            + create_recipes(cls.other, 15, ingredients)
+        )
+        Follow.objects.create(user=cls.user, author=cls.followed)
+        cls.favorited = {recipe.id for recipe in recipes[::2]}
+        cls.in_cart = {recipe.id for recipe in recipes[::3]}
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe_id=pk) for pk in cls.favorited
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe_id=pk) for pk in cls.in_cart
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for limit in (6, 24):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(5):
+                    response = self.client.get(
+                        f'/api/recipes/?limit={limit}'
+                    )
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_flags(self):
+        response = self.client.get('/api/recipes/?limit=24')
+        for recipe in response.data['results']:
+            with self.subTest(recipe=recipe['id']):
+                self.assertEqual(
+                    recipe['is_favorited'], recipe['id'] in self.favorited
+                )
+                self.assertEqual(
+                    recipe['is_in_shopping_cart'],
+                    recipe['id'] in self.in_cart,
+                )
+                self.assertEqual(
+                    recipe['author']['is_subscribed'],
+                    recipe['author']['id'] == self.followed.id,
+                )
+
+
+class RecipeListCacheStatsTests(TestCase):
+    """Попадания и промахи кеша списка попадают в метрики."""
+
+    def test_hits_and_misses(self):
+        cache.clear()
+        before = recipe_list_cache.stats()
+        client = APIClient()
+        for _ in range(3):
+            client.get('/api/recipes/?limit=6')
+        stats = recipe_list_cache.stats()
+        self.assertEqual(stats['misses'] - before['misses'], 1)
+        self.assertEqual(stats['hits'] - before['hits'], 2)
+        content = client.get('/api/metrics').content.decode()
+        self.assertIn('# TYPE recipe_list_cache_hits counter', content)
+        self.assertIn(f'recipe_list_cache_hits {stats["hits"]}', content)
+
+
+@skipUnless(
+    connection.vendor in ('postgresql', 'sqlite'),
+    'Полнотекстовый индекс есть только в PostgreSQL и SQLite',
+)
+class RecipeSearchTests(TestCase):
+    """Полнотекстовый поиск по списку рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('cook')
+        beet = Ingredient.objects.create(name='Свёкла', measurement_unit='г')
+        recipes = {}
+        for name, text in (
+            ('Борщ', 'Суп со свёклой'),
+            ('Щи', 'Почти борщ, только без свёклы'),
+            ('Салат', 'Овощи'),
+        ):
+            recipes[name] = Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=10
+            )
+        IngredientsInRecipe.objects.create(
+            recipe=recipes['Салат'], ingredient=beet, amount=100
+        )
+        # Индекс обновляется в on_commit, который TestCase не вызывает.
+        reindex()
+
+    def search(self, query):
+        response = self.client.get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_name_ranks_above_text(self):
+        self.assertEqual(self.search('борщ'), ['Борщ', 'Щи'])
+
+    def test_ingredient_ranks_above_text(self):
+        self.assertEqual(self.search('свёкла')[0], 'Салат')
+
+    def test_no_match(self):
+        self.assertEqual(self.search('пельмени'), [])
+
+    def test_cursor_is_rejected(self):
+        response = self.client.get(
+            '/api/recipes/', {'search': 'борщ', 'cursor': ''}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+
+
+class ImageDerivativesTests(TestCase):
+    """Готовые копии изображения меняют ETag рецепта."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_etag_changes_when_derivatives_are_built(self):
+        recipe = create_recipes(create_user('painter'), 1, [])[0]
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(buffer, 'PNG')
+        default_storage.save(recipe.image.name, ContentFile(buffer.getvalue()))
+        url = f'/api/recipes/{recipe.id}/'
+        before = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            build_derivatives(recipe.image.name)
+        after = self.client.get(url, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertTrue(after.data['images']['card'].endswith('_card.webp'))
+
+
+class StaleSaveTests(TestCase):
+    """Полное сохранение устаревшего экземпляра не затирает счётчики."""
+
+    def test_user_recipes_count(self):
+        user = create_user('author')
+        stale = User.objects.get(pk=user.pk)
+        Recipe.objects.create(
+            author=user, name='Рецепт', text='Описание', cooking_time=10
+        )
+        stale.first_name = 'Автор'
+        stale.save()
+        user.refresh_from_db()
+        self.assertEqual(user.first_name, 'Автор')
+        self.assertEqual(user.recipes_count, 1)
+
+    def test_recipe_favorites_count(self):
+        user = create_user('fan')
+        recipe = Recipe.objects.create(
+            author=user, name='Рецепт', text='Описание', cooking_time=10
+        )
+        Favorite.objects.create(user=user, recipe=recipe)
+        recipe.name = 'Другой рецепт'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Другой рецепт')
+        self.assertEqual(recipe.favorites_count, 1)
+
+
+class FavoriteToggleTests(TestCase):
+    """Удаление одного рецепта из избранного и корзины."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('toggler')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Описание', cooking_time=10
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_delete(self):
+        for path, counter in (
+            ('favorite', 'favorites_count'),
+            ('shopping_cart', 'cart_count'),
+        ):
+            url = f'/api/recipes/{self.recipe.id}/{path}/'
+            with self.subTest(path=path):
+                self.assertEqual(self.client.post(url).status_code, 201)
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.delete(url)
+                self.assertEqual(response.status_code, 204)
+                self.assertEqual(self.client.delete(url).status_code, 400)
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 0)
+
+    def test_delete_unknown_recipe(self):
+        for path in ('favorite', 'shopping_cart'):
+            with self.subTest(path=path):
+                response = self.client.delete(f'/api/recipes/0/{path}/')
+                self.assertEqual(response.status_code, 404)
+
+
+class BulkDeleteQueryTests(TestCase):
+    """Массовое удаление не зависит по числу запросов от числа рецептов."""
+
+    def test_query_count_does_not_depend_on_size(self):
+        for model, path, counter in (
+            (Favorite, 'favorite', 'favorites_count'),
+            (ShoppingCart, 'shopping_cart', 'cart_count'),
+        ):
+            for size in (1, 50):
+                with self.subTest(path=path, size=size):
+                    user = create_user(f'{path}{size}')
+                    ids = [
+                        recipe.id for recipe in create_recipes(user, size, [])
+                    ]
+                    client = APIClient()
+                    client.force_authenticate(user)
+                    client.post(
+                        f'/api/recipes/{path}/', {'recipes': ids},
+                        format='json',
+                    )
+                    with self.assertNumQueries(6):
+                        response = client.delete(
+                            f'/api/recipes/{path}/', {'recipes': ids},
+                            format='json',
+                        )
+                    self.assertEqual(
+                        {item['status'] for item in response.data},
+                        {'removed'},
+                    )
+                    self.assertFalse(model.objects.filter(user=user).exists())
+                    self.assertFalse(
+                        Recipe.objects.filter(
+                            pk__in=ids, **{f'{counter}__gt': 0}
+                        ).exists()
+                    )
+
+
+class ToggleConcurrencyTests(TransactionTestCase):
+    """Одновременные запросы на добавление и удаление одного рецепта."""
+    threads = 8
+
+    def setUp(self):
+        self.user = create_user('clicker')
+        self.recipe = create_recipes(self.user, 1, [])[0]
+
+    def run_concurrently(self, method, url):
+        barrier = threading.Barrier(self.threads)
+        statuses = []
+
+        def request():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                statuses.append(getattr(client, method)(url).status_code)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=request) for _ in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return sorted(statuses)
+
+    def test_toggle(self):
+        for model, path, counter in (
+            (Favorite, 'favorite', 'favorites_count'),
+            (ShoppingCart, 'shopping_cart', 'cart_count'),
+        ):
+            url = f'/api/recipes/{self.recipe.id}/{path}/'
+            with self.subTest(path=path):
+                self.assertEqual(
+                    self.run_concurrently('post', url),
+                    [201] + [400] * (self.threads - 1),
+                )
+                self.assertEqual(model.objects.count(), 1)
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 1)
+                self.assertEqual(
+                    self.run_concurrently('delete', url),
+                    [204] + [400] * (self.threads - 1),
+                )
+                self.assertEqual(model.objects.count(), 0)
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 0)
+
+
+class ChangeLogConcurrencyTests(TransactionTestCase):
+    """Записи журнала из разных потоков получают разные номера."""
+    threads = 8
+
+    def test_no_entry_is_lost(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        file_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location.name,
+        }}
+        changes = ChangeLog('test', self.threads)
+        barrier = threading.Barrier(self.threads)
+
+        def write(recipe_id):
+            try:
+                barrier.wait()
+                changes.log([recipe_id])
+            finally:
+                connection.close()
+
+        with override_settings(CACHES=file_cache):
+            workers = [
+                threading.Thread(target=write, args=(recipe_id,))
+                for recipe_id in range(self.threads)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            self.assertEqual(changes.last(), self.threads)
+            self.assertEqual(
+                changes.since(0, changes.last()), list(range(self.threads))
+            )
@@ -13,11 +13,26 @@ api_router.register('users', CustomUserViewSet, basename='users')
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics', views.metrics, name='metrics'),
     path(
         'recipes/download_shopping_cart/',
         views.download_shopping_cart,
         name='download_shopping_cart',
     ),
+    path(
+        'recipes/favorite/',
+        views.FavoriteBulkViewSet.as_view(
+            {'post': 'create', 'delete': 'delete'}
+        ),
+        name='favorite_bulk',
+    ),
+    path(
+        'recipes/shopping_cart/',
+        views.ShoppingCartBulkViewSet.as_view(
+            {'post': 'create', 'delete': 'delete'}
+        ),
+        name='shopping_cart_bulk',
+    ),
     re_path(
         r'recipes/(?P<recipe_id>[\d]+)/favorite/',
         views.FavoriteViewSet.as_view({'post': 'create', 'delete': 'delete'}),
@@ -1,9 +1,51 @@
-from rest_framework.renderers import BaseRenderer
+import hashlib
+from datetime import datetime, timezone
 
+from django.db.models import F, Sum
+from django.views.decorators.http import condition
 
-class PlainTextRenderer(BaseRenderer):
-    media_type = 'text/plain'
-    format = 'txt'
+from recipes.models import IngredientsInRecipe
+from recipes.versions import get_versions
 
-    def render(self, data, media_type=None, renderer_context=None):
-        return data
+
+def get_shopping_list(user):
+    """Суммы ингредиентов из корзины пользователя одним запросом."""
+    return (
+        IngredientsInRecipe.objects
+        .filter(recipe__is_in_shopping_cart__user=user)
+        .values(
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        )
+        .annotate(total=Sum('amount'))
+        .order_by('name', 'measurement_unit')
+    )
+
+
+def versioned(get_names, per_user=False):
+    """Условный GET (ETag и Last-Modified) по меткам ``recipes.versions``.
+
+    ``get_names(request, **kwargs)`` возвращает имена меток, от которых
+    зависит ответ. При совпадении If-None-Match или If-Modified-Since
+    отдаётся 304 без обращения к сериализатору. Если ответ зависит от
+    пользователя, ``per_user`` добавляет его id в ETag.
+    """
+    def get_stamps(request, **kwargs):
+        if not hasattr(request, '_version_stamps'):
+            request._version_stamps = get_versions(
+                get_names(request, **kwargs)
+            )
+        return request._version_stamps
+
+    def etag(request, *args, **kwargs):
+        parts = [f'{stamp:.6f}' for stamp in get_stamps(request, **kwargs)]
+        if per_user:
+            parts.append(str(request.user.pk))
+        return hashlib.md5('-'.join(parts).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return datetime.fromtimestamp(
+            max(get_stamps(request, **kwargs)), tz=timezone.utc
+        )
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -1,24 +1,64 @@
-from io import StringIO
+from itertools import chain
 
-from django.shortcuts import get_list_or_404, get_object_or_404
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action, api_view, renderer_classes
-from rest_framework.filters import SearchFilter
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from recipes.counters import get_counter, recount, remove_entries
+from recipes.feed import get_feed
+from recipes.metrics import SIZE_BUCKETS, registry
 from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
-from .filters import RecipeFilter
+from recipes.pantry import pantry_index
+from recipes.similarity import (favorite_changes, recommended_recipe_ids,
+                                similar_recipe_ids)
+from recipes.versions import bump_version
+from .cache import recipe_list_cache
+from .filters import IngredientSearchFilter, RecipeFilter, RecipeSearchFilter
 from .pagination import PageLimitPagination
 from .permissions import IsAuthorOrAdminOrReadOnly
 from .serializers import (TagSerializer,
                           IngredientSerializer,
                           RecipeRetrieveSerializer,
                           RecipeCreateUpdateSerializer,
-                          RecipeMinifiedSerializer)
-from .utils import PlainTextRenderer
+                          RecipeMinifiedSerializer,
+                          RecipeMatchSerializer,
+                          RecipeMatchParamsSerializer,
+                          RecipeLimitParamsSerializer,
+                          RecipeIdsSerializer)
+from .renderers import SHOPPING_LIST_RENDERERS
+from .utils import get_shopping_list, versioned
 
 
+EXPORT_SIZE = registry.histogram(
+    'shopping_list_export_bytes', 'Размер выгруженного списка покупок',
+    SIZE_BUCKETS,
+)
+
+
+def tag_versions(request, **kwargs):
+    return ('tags',)
+
+
+def ingredient_versions(request, **kwargs):
+    return ('ingredients',)
+
+
+def recipe_versions(request, pk=None, **kwargs):
+    names = [f'recipe:{pk}', 'tags', 'ingredients', 'users']
+    if request.user.is_authenticated:
+        names.append(f'user:{request.user.pk}')
+    return names
+
+
+@method_decorator(versioned(tag_versions), name='list')
+@method_decorator(versioned(tag_versions), name='retrieve')
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -26,52 +66,123 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
 
 
+@method_decorator(versioned(ingredient_versions), name='list')
+@method_decorator(versioned(ingredient_versions), name='retrieve')
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
-    filter_backends = [SearchFilter]
-    search_fields = ['^name']
+    filter_backends = (IngredientSearchFilter,)
 
 
+@method_decorator(
+    versioned(recipe_versions, per_user=True), name='retrieve'
+)
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrAdminOrReadOnly]
     pagination_class = PageLimitPagination
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, RecipeSearchFilter)
     filterset_class = RecipeFilter
     http_method_names = ['get', 'post', 'patch', 'create', 'delete']
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Recipe.objects.read_plan(self.request.user)
+        return Recipe.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return super().list(request, *args, **kwargs)
+        key = recipe_list_cache.key(request)
+        data = recipe_list_cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            recipe_list_cache.set(key, data)
+        return Response(data)
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in (
+            'list', 'retrieve', 'feed', 'similar', 'recommended'
+        ):
             return RecipeRetrieveSerializer
+        if self.action == 'by_ingredients':
+            return RecipeMatchSerializer
         return RecipeCreateUpdateSerializer
 
     @action(
-        detail=True,
-        methods=['post', 'delete'],
+        detail=False,
+        methods=['get'],
         permission_classes=[IsAuthenticated]
     )
-    def add_to(self, model, user, pk):
-        if model.objects.filter(user=user, recipe__id=pk).exists():
-            return Response({'errors': 'Рецепт уже добавлен!'},
-                            status=status.HTTP_400_BAD_REQUEST)
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
-        serializer = RecipeMinifiedSerializer(recipe)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def feed(self, request):
+        queryset = get_feed(request.user).read_plan(request.user)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='by-ingredients',
+        permission_classes=[AllowAny]
+    )
+    def by_ingredients(self, request):
+        params = RecipeMatchParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        matches = pantry_index.match(
+            params.validated_data['ingredients'],
+            params.validated_data['limit'],
+            params.validated_data.get('max_missing'),
+        )
+        scores = {
+            recipe_id: (matched, missing)
+            for recipe_id, matched, missing in matches
+        }
+        recipes = self.get_recipes(list(scores))
+        for recipe in recipes:
+            recipe.matched, recipe.missing = scores[recipe.pk]
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+        recipes = self.get_recipes(
+            similar_recipe_ids(recipe.pk, self.get_limit())
+        )
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated]
+    )
+    def recommended(self, request):
+        recipes = self.get_recipes(
+            recommended_recipe_ids(request.user, self.get_limit())
+        )
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
+
+    def get_limit(self):
+        params = RecipeLimitParamsSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data['limit']
 
-    def delete_from(self, model, user, pk):
-        obj = model.objects.filter(user=user, recipe__id=pk)
-        if obj.exists():
-            obj.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response({'errors': 'Рецепт уже удален!'},
-                        status=status.HTTP_400_BAD_REQUEST)
+    def get_recipes(self, recipe_ids):
+        """Рецепты в порядке ``recipe_ids``.
+
+        Рецепты, удалённые после построения индекса, пропускаются.
+        """
+        recipes = Recipe.objects.read_plan(self.request.user).in_bulk(
+            recipe_ids
+        )
+        return [recipes[pk] for pk in recipe_ids if pk in recipes]
 
 
 class FavoriteViewSet(viewsets.ReadOnlyModelViewSet):
@@ -80,21 +191,26 @@ class FavoriteViewSet(viewsets.ReadOnlyModelViewSet):
     model = Favorite
 
     def get_queryset(self):
-        return get_object_or_404(Recipe, id=self.kwargs.get('recipe_id'))
+        return get_object_or_404(
+            Recipe.objects.minified(), id=self.kwargs.get('recipe_id')
+        )
 
     def create(self, request, *args, **kwargs):
-        user = self.request.user
         recipe = self.get_queryset()
-        if not self.model.objects.filter(user=user, recipe=recipe).exists():
-            self.model.objects.create(user=user, recipe=recipe)
+        try:
+            with transaction.atomic():
+                self.model.objects.create(user=request.user, recipe=recipe)
+        except IntegrityError:
+            return Response({'errors': 'Рецепт уже добавлен!'},
+                            status=status.HTTP_400_BAD_REQUEST)
         serializer = self.get_serializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, *args, **kwargs):
-        user = self.request.user
         recipe = self.get_queryset()
-        instance = get_object_or_404(self.model, user=user, recipe=recipe)
-        instance.delete()
+        if not remove_entries(self.model, request.user, [recipe.pk]):
+            return Response({'errors': 'Рецепт уже удален!'},
+                            status=status.HTTP_400_BAD_REQUEST)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -102,34 +218,103 @@ class ShoppingCartViewSet(FavoriteViewSet):
     model = ShoppingCart
 
 
+class FavoriteBulkViewSet(viewsets.ViewSet):
+    """Добавление и удаление сразу нескольких рецептов.
+
+    Для каждого id из ``recipes`` возвращается статус: ``added`` или
+    ``exists`` при добавлении, ``removed`` или ``absent`` при удалении,
+    ``not_found`` для несуществующего рецепта.
+    """
+    model = Favorite
+
+    def get_recipe_ids(self):
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['recipes']
+
+    def get_results(self, ids, statuses):
+        return Response(
+            [{'id': pk, 'status': statuses.get(pk, 'not_found')}
+             for pk in ids]
+        )
+
+    def create(self, request):
+        user = request.user
+        ids = self.get_recipe_ids()
+        found = set(
+            Recipe.objects.filter(pk__in=ids).values_list('id', flat=True)
+        )
+        existing = set(
+            self.model.objects.filter(user=user, recipe_id__in=found)
+            .values_list('recipe_id', flat=True)
+        )
+        added = found - existing
+        with transaction.atomic():
+            self.model.objects.bulk_create(
+                [self.model(user=user, recipe_id=pk) for pk in added],
+                ignore_conflicts=True,
+            )
+            # bulk_create не рассылает сигналы: счётчики и метки версий
+            # обновляются здесь, одним запросом на все рецепты.
+            recount(
+                get_counter(self.model), Recipe.objects.filter(pk__in=added)
+            )
+        bump_version(f'user:{user.pk}', *(f'recipe:{pk}' for pk in added))
+        if self.model is Favorite:
+            favorite_changes.log(added)
+        statuses = dict.fromkeys(existing, 'exists')
+        statuses.update(dict.fromkeys(added, 'added'))
+        return self.get_results(ids, statuses)
+
+    def delete(self, request):
+        ids = self.get_recipe_ids()
+        removed = remove_entries(self.model, request.user, ids)
+        found = set(
+            Recipe.objects.filter(pk__in=ids).values_list('id', flat=True)
+        )
+        statuses = dict.fromkeys(found, 'absent')
+        statuses.update(dict.fromkeys(removed, 'removed'))
+        return self.get_results(ids, statuses)
+
+
+class ShoppingCartBulkViewSet(FavoriteBulkViewSet):
+    model = ShoppingCart
+
+
 @api_view(['GET'])
-@renderer_classes([PlainTextRenderer])
+@renderer_classes(SHOPPING_LIST_RENDERERS)
 def download_shopping_cart(request):
-    user = request.user
-    cart = get_list_or_404(
-        ShoppingCart.objects.select_related('recipe').prefetch_related(
-            'recipe__ingredients'
-        ),
-        user=user
+    items = get_shopping_list(request.user).iterator()
+    first = next(items, None)
+    if first is None:
+        # Ошибку отдаём в JSON, а не рендерером файла списка покупок.
+        request.accepted_renderer = JSONRenderer()
+        request.accepted_media_type = JSONRenderer.media_type
+        raise Http404
+    renderer = request.accepted_renderer
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type += f'; charset={renderer.charset}'
+    response = StreamingHttpResponse(
+        measure_export(renderer.stream(chain((first,), items)), renderer),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{renderer.get_filename()}"'
+    )
+    return response
+
+
+def measure_export(chunks, renderer):
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        yield chunk
+    EXPORT_SIZE.observe(size, format=renderer.format)
+
+
+@require_GET
+def metrics(request):
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
     )
-    ingredients = []
-    for i in cart:
-        ingredients.extend(
-            i.recipe.ingredients.all()
-        )
-    ingredients_dict = {}
-    for i in ingredients:
-        if i.ingredient_id not in ingredients_dict:
-            ingredients_dict[i.ingredient_id] = 0
-        ingredients_dict[i.ingredient_id] += i.amount
-    data = StringIO()
-    for i in ingredients_dict:
-        ingredient = Ingredient.objects.get(id=i)
-        text = f'{ingredient.name} ({ingredient.measurement_unit}) —'
-        text += f' {ingredients_dict[i]} \n'
-        data.write(text)
-    data.seek(0)
-    headers = {
-        'Content-Disposition': 'attachment; filename="list.txt"',
-    }
-    return Response(data, status=status.HTTP_200_OK, headers=headers)
@@ -1,6 +1,9 @@
 import os
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 RUN_LOCAL = False
 
@@ -29,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,6 +79,31 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT', default=5432),
     }
 }
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Тестам с потоками нужна файловая база: по умолчанию SQLite создаёт
+    # тестовую базу в памяти. Файл кладём во временный каталог, а не
+    # в дерево исходников.
+    DATABASES['default']['TEST'] = {
+        'NAME': os.path.join(tempfile.gettempdir(), 'foodgram_test.sqlite3')
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+# Метки версий и журналы изменений живут в кеше: у LocMemCache он свой
+# в каждом процессе, и воркеры разошлись бы в том, что уже изменилось.
+# Число воркеров gunicorn берёт из WEB_CONCURRENCY.
+WORKERS = int(os.getenv('WEB_CONCURRENCY', default=1))
+if WORKERS > 1 and CACHES['default']['BACKEND'].endswith('LocMemCache'):
+    raise ImproperlyConfigured(
+        'При WEB_CONCURRENCY > 1 нужен общий кеш: задайте CACHE_BACKEND.'
+    )
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -116,12 +145,46 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static')
 
 MEDIA_URL = '/backend_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media')
+RECIPE_IMAGE_SIZES = {
+    'thumbnail': (240, 240),
+    'card': (640, 640),
+    'full': (1600, 1600),
+}
+RECIPE_IMAGE_FORMAT = os.getenv('RECIPE_IMAGE_FORMAT', default='WEBP')
+RECIPE_IMAGE_QUALITY = 85
+RECIPE_IMAGE_SYNC = os.getenv('RECIPE_IMAGE_SYNC', default='') == 'True'
+INGREDIENT_SEARCH_LIMIT = 50
+RECIPE_LIST_CACHE_TIMEOUT = 300
+FEED_STRATEGY = os.getenv('FEED_STRATEGY', default='read')
+FEED_LENGTH = 500
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', default=200))
+SQL_LOG_SAMPLE_RATE = float(os.getenv('SQL_LOG_SAMPLE_RATE', default=0.1))
+METRICS_DIR = os.getenv('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = 1
 AUTH_USER_MODEL = 'users.User'
 NAME_FIELD_MAX_LENGTH = 200
 USER_NAME_MAX_LENGTH = 150
 SLUG_FIELD_MAX_LENGTH = 50
 
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.middleware': {
+            'handlers': ['console'],
+            'level': os.getenv('SQL_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
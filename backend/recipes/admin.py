@@ -1,6 +1,7 @@
 from django.contrib.admin import ModelAdmin, TabularInline, site
 from django.contrib.auth.admin import UserAdmin
 
+from recipes.fulltext import search_recipes
 from recipes.models import (Ingredient, IngredientsInRecipe, Recipe, Tag,
                      TagsInRecipe, User)
 
@@ -17,12 +18,20 @@ class IngredientAdmin(ModelAdmin):
 
 
 class RecipeAdmin(ModelAdmin):
-    list_display = ('id', 'name', 'author', 'cooking_time',)
+    list_display = (
+        'id', 'name', 'author', 'cooking_time', 'favorites_count',
+        'cart_count',
+    )
     search_fields = ('text', 'name')
     list_editable = ('author', 'name', 'cooking_time')
     list_filter = ('author', 'name', 'tags')
     inlines = (RecipeIngredientInline,)
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_recipes(queryset, search_term), False
+
 
 class TagAdmin(ModelAdmin):
     list_display = ('id', 'name', 'slug', 'color')
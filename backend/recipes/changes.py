@@ -0,0 +1,84 @@
+"""Журналы изменённых рецептов в кеше Django.
+
+Записи хранят отсортированные id рецептов или ``None`` — «изменилось
+всё». Номера записей выдаёт строка ``ChangeLogCounter`` в базе: UPDATE
+с F() атомарен на любой базе, а ``incr`` файлового кеша — нет, и две
+записи с одним номером затёрли бы друг друга. Последний номер
+дублируется в кеш, чтобы читатель не ходил за ним в базу на каждом
+запросе; пока строка счётчика заблокирована, его пишет только один
+писатель, так что номер в кеше не откатывается назад. Читатель помнит номер
+последней применённой записи и забирает только новые; если записи
+пропали из кеша или их слишком много, он начинает заново.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from recipes.models import ChangeLogCounter
+
+TIMEOUT = 24 * 60 * 60
+BATCH_SIZE = 1000
+
+
+class ChangeLog:
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.key = f'changes:{name}'
+        self.limit = limit
+
+    def log(self, recipe_ids=None):
+        """Добавляет запись после фиксации текущей транзакции."""
+        if recipe_ids is not None:
+            recipe_ids = sorted(set(recipe_ids))
+            if not recipe_ids:
+                return
+
+        def write():
+            # Строка счётчика заблокирована до конца транзакции, поэтому
+            # читатель увидит новый номер не раньше самой записи.
+            with transaction.atomic():
+                number = self._next_number()
+                cache.set(f'{self.key}:{number}', recipe_ids, TIMEOUT)
+                cache.set(self.key, number, timeout=None)
+        transaction.on_commit(write)
+
+    def _next_number(self):
+        counter = ChangeLogCounter.objects.filter(name=self.name)
+        if not counter.update(number=F('number') + 1):
+            ChangeLogCounter.objects.bulk_create(
+                [ChangeLogCounter(name=self.name)], ignore_conflicts=True
+            )
+            counter.update(number=F('number') + 1)
+        return counter.values_list('number', flat=True).get()
+
+    def last(self):
+        number = cache.get(self.key)
+        if number is None:
+            number = ChangeLogCounter.objects.filter(
+                name=self.name
+            ).values_list('number', flat=True).first() or 0
+            cache.add(self.key, number, timeout=None)
+        return number
+
+    def since(self, applied, number):
+        """Рецепты из записей после ``applied`` до ``number`` включительно.
+
+        ``None`` — читателю нужно начать заново: он ещё ничего не читал,
+        отстал больше чем на ``limit`` записей, записи вытеснены из кеша
+        или одна из них означает «изменилось всё».
+        """
+        if applied is None or not 0 <= number - applied <= self.limit:
+            return None
+        changed = set()
+        for start in range(applied + 1, number + 1, BATCH_SIZE):
+            keys = [
+                f'{self.key}:{n}'
+                for n in range(start, min(start + BATCH_SIZE, number + 1))
+            ]
+            entries = cache.get_many(keys)
+            if len(entries) < len(keys) or None in entries.values():
+                return None
+            for recipe_ids in entries.values():
+                changed.update(recipe_ids)
+        return sorted(changed)
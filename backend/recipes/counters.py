@@ -0,0 +1,107 @@
+from collections import namedtuple
+
+from django.db import connections, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+# Рассылается remove_entries вместо post_delete на каждую строку;
+# аргументы — user_id и recipe_ids.
+entries_removed = Signal()
+
+Counter = namedtuple(
+    'Counter', ('model', 'field', 'related_model', 'related_field')
+)
+
+COUNTERS = (
+    Counter(User, 'recipes_count', Recipe, 'author'),
+    Counter(Recipe, 'favorites_count', Favorite, 'recipe'),
+    Counter(Recipe, 'cart_count', ShoppingCart, 'recipe'),
+)
+
+
+def get_counter(related_model):
+    return next(
+        counter for counter in COUNTERS
+        if counter.related_model is related_model
+    )
+
+
+def shift(counter, instance, delta):
+    """Сдвигает счётчик владельца ``instance`` одним UPDATE с F()."""
+    counter.model.objects.filter(
+        pk=getattr(instance, f'{counter.related_field}_id')
+    ).update(**{counter.field: F(counter.field) + delta})
+
+
+def actual_count(counter):
+    rows = (
+        counter.related_model.objects
+        .filter(**{counter.related_field: OuterRef('pk')})
+        .order_by()
+        .values(counter.related_field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def drift(counter, queryset=None):
+    """Записи, у которых сохранённый счётчик расходится с фактическим."""
+    if queryset is None:
+        queryset = counter.model.objects.all()
+    return queryset.annotate(actual=actual_count(counter)).exclude(
+        **{counter.field: F('actual')}
+    )
+
+
+def recount(counter, queryset=None):
+    if queryset is None:
+        queryset = counter.model.objects.all()
+    return queryset.update(**{counter.field: actual_count(counter)})
+
+
+def delete_rows(queryset):
+    """Удаляет строки ``queryset`` одним DELETE и возвращает их число.
+
+    В отличие от ``QuerySet.delete()`` строки не выбираются заранее и
+    post_delete не рассылается: при гонке двух удалений сигнал получили
+    бы оба запроса, хотя строку удалил только один.
+    """
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    meta = queryset.model._meta
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(meta.db_table)} '
+            f'WHERE {quote(meta.pk.column)} IN ({sql})',
+            params,
+        )
+        return cursor.rowcount
+
+
+def remove_entries(model, user, recipe_ids):
+    """Убирает рецепты из избранного или корзины ``user``.
+
+    Возвращает id рецептов, строки которых удалил этот вызов. Последствия
+    удаления — счётчики, метки версий, журналы — делают получатели
+    ``entries_removed`` в ``recipes.signals``, одним вызовом на все
+    рецепты. Если часть строк успел удалить параллельный запрос, эти
+    рецепты могут попасть в ответ обоих: счётчики при этом верны, так как
+    пересчитываются по таблице.
+    """
+    entries = model.objects.filter(user=user, recipe_id__in=recipe_ids)
+    removed = set(entries.values_list('recipe_id', flat=True))
+    if not removed:
+        return removed
+    with transaction.atomic(using=entries.db):
+        if not delete_rows(entries.filter(recipe_id__in=removed)):
+            return set()
+        entries_removed.send(
+            sender=model, user_id=user.pk, recipe_ids=removed
+        )
+    return removed
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+BATCH_SIZE = 1000
+
+
+def get_feed(user):
+    """Рецепты авторов, на которых подписан ``user``, новые первыми.
+
+    При FEED_STRATEGY = 'read' лента собирается соединением с подписками
+    (fan-out on read), при 'write' читается из заранее заполненной
+    таблицы ``FeedEntry`` (fan-out on write).
+    """
+    if settings.FEED_STRATEGY == 'write':
+        return Recipe.objects.filter(feed_entries__user=user).order_by(
+            '-feed_entries__pub_date', '-id'
+        )
+    return Recipe.objects.filter(author__following__user=user).order_by(
+        '-pub_date', '-id'
+    )
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(author_id=recipe.author_id).values_list(
+        'user_id', flat=True
+    ).iterator()
+    batch = []
+    for user_id in followers:
+        batch.append(user_id)
+        if len(batch) == BATCH_SIZE:
+            _push(recipe, batch)
+            batch = []
+    if batch:
+        _push(recipe, batch)
+
+
+def _push(recipe, user_ids):
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+            for user_id in user_ids
+        ),
+        ignore_conflicts=True,
+    )
+    trim(user_ids)
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту последними рецептами нового автора подписки."""
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date'
+    ).values_list('id', 'pub_date')[:settings.FEED_LENGTH]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for recipe_id, pub_date in recipes
+        ),
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def forget(user_id, author_id):
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def trim(user_ids):
+    """Оставляет в лентах ``user_ids`` не больше FEED_LENGTH записей."""
+    entries = FeedEntry.objects.filter(user_id__in=user_ids)
+    if not connections[entries.db].features.supports_over_clause:
+        for user_id in user_ids:
+            stale = list(
+                FeedEntry.objects.filter(user_id=user_id).values_list(
+                    'id', flat=True
+                )[settings.FEED_LENGTH:]
+            )
+            if stale:
+                FeedEntry.objects.filter(pk__in=stale).delete()
+        return
+    sql, params = entries.annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('user_id'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )
+    ).order_by().values('id', 'position').query.sql_with_params()
+    FeedEntry.objects.filter(
+        pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE position > %s',
+            params + (settings.FEED_LENGTH,),
+        )
+    ).delete()
+
+
+def rebuild(user_ids=None):
+    follows = Follow.objects.order_by('user_id')
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+    FeedEntry.objects.filter(
+        user_id__in=follows.values('user_id')
+    ).delete()
+    for user_id, author_id in follows.values_list(
+        'user_id', 'author_id'
+    ).iterator():
+        backfill(user_id, author_id)
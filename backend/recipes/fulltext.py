@@ -0,0 +1,118 @@
+"""Полнотекстовый поиск рецептов.
+
+Документ рецепта складывается из названия, названий ингредиентов и
+описания с убывающими весами. В PostgreSQL он хранится как ``tsvector``
+в таблице ``recipes_recipe_search`` с GIN-индексом, в SQLite — в
+виртуальной таблице FTS5 с тем же именем (см. миграции 0009 и 0012). В
+обеих документ связан с рецептом колонкой ``rowid``. На других базах
+поиск сводится к ``icontains``.
+"""
+import re
+
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+TABLE = 'recipes_recipe_search'
+CONFIG = 'russian'
+BATCH_SIZE = 500
+
+POSTGRESQL_REINDEX = f'''
+    INSERT INTO {TABLE} (rowid, document)
+    SELECT r.id,
+           setweight(to_tsvector('{CONFIG}', r.name), 'A')
+           || setweight(to_tsvector(
+               '{CONFIG}', coalesce(string_agg(i.name, ' '), '')
+           ), 'B')
+           || setweight(to_tsvector('{CONFIG}', r.text), 'C')
+    FROM recipes_recipe r
+    LEFT JOIN recipes_ingredientsinrecipe ri ON ri.recipe_id = r.id
+    LEFT JOIN recipes_ingredient i ON i.id = ri.ingredient_id
+    {{where}}
+    GROUP BY r.id
+    ON CONFLICT (rowid) DO UPDATE SET document = EXCLUDED.document
+'''
+SQLITE_DELETE = f'DELETE FROM {TABLE} {{where}}'
+SQLITE_REINDEX = f'''
+    INSERT INTO {TABLE} (rowid, name, ingredients, text)
+    SELECT r.id, r.name, coalesce(group_concat(i.name, ' '), ''), r.text
+    FROM recipes_recipe r
+    LEFT JOIN recipes_ingredientsinrecipe ri ON ri.recipe_id = r.id
+    LEFT JOIN recipes_ingredient i ON i.id = ri.ingredient_id
+    {{where}}
+    GROUP BY r.id
+'''
+# Веса колонок name, ingredients, text; bm25 тем меньше, чем лучше.
+SQLITE_RANK = f'-bm25({TABLE}, 1.0, 0.4, 0.2)'
+
+
+def reindex(recipe_ids=None):
+    """Обновляет документы рецептов; без ``recipe_ids`` — все.
+
+    Удалённые рецепты пропадают из индекса: в PostgreSQL по внешнему
+    ключу, в SQLite — при переиндексации их id.
+    """
+    vendor = connection.vendor
+    if vendor not in ('postgresql', 'sqlite'):
+        return
+    with connection.cursor() as cursor:
+        if recipe_ids is None:
+            if vendor == 'postgresql':
+                cursor.execute(POSTGRESQL_REINDEX.format(where=''))
+            else:
+                cursor.execute(SQLITE_DELETE.format(where=''))
+                cursor.execute(SQLITE_REINDEX.format(where=''))
+            return
+        recipe_ids = list(recipe_ids)
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            ids = recipe_ids[start:start + BATCH_SIZE]
+            if vendor == 'postgresql':
+                cursor.execute(
+                    POSTGRESQL_REINDEX.format(where='WHERE r.id = ANY(%s)'),
+                    [ids],
+                )
+                continue
+            placeholders = ', '.join(['%s'] * len(ids))
+            cursor.execute(
+                SQLITE_DELETE.format(where=f'WHERE rowid IN ({placeholders})'),
+                ids,
+            )
+            cursor.execute(
+                SQLITE_REINDEX.format(where=f'WHERE r.id IN ({placeholders})'),
+                ids,
+            )
+
+
+def fts_query(query):
+    """Запрос FTS5 из слов пользователя: все слова, каждое как префикс."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под ``query``, по убыванию релевантности.
+
+    Таблица индекса присоединяется к выборке через ``search_document``,
+    чтобы ранг считался в том же проходе, что и сопоставление: в SQLite
+    коррелированный подзапрос повторял бы MATCH для каждой строки.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = f"websearch_to_tsquery('{CONFIG}', %s)"
+        match = f'{TABLE}.document @@ {tsquery}', [query]
+        rank = f'ts_rank({TABLE}.document, {tsquery})', [query]
+    elif vendor == 'sqlite':
+        expression = fts_query(query)
+        if not expression:
+            return queryset.none()
+        match = f'{TABLE} MATCH %s', [expression]
+        rank = SQLITE_RANK, []
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset.filter(
+        RawSQL(*match, output_field=BooleanField()),
+        search_document__isnull=False,
+    ).annotate(
+        search_rank=RawSQL(*rank, output_field=FloatField())
+    ).order_by('-search_rank', '-id')
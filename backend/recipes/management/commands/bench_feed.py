@@ -0,0 +1,106 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from recipes import feed
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение ленты fan-out on read и fan-out on write. '
+        'Изменения в базе откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=10000)
+        parser.add_argument('--authors', type=int, default=20)
+        parser.add_argument('--follows-per-user', type=int, default=5)
+        parser.add_argument('--recipes-per-author', type=int, default=10)
+        parser.add_argument('--reads', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        with transaction.atomic():
+            authors, followers = self.fill_users(options)
+            publish = self.publish(authors, options['recipes_per_author'])
+            readers = random.sample(
+                followers, min(options['reads'], len(followers))
+            )
+            results = {}
+            for strategy in ('read', 'write'):
+                with override_settings(FEED_STRATEGY=strategy):
+                    results[strategy] = self.read(readers)
+            entries = FeedEntry.objects.count()
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f'fan-out on write: {statistics.mean(publish):.2f} мс на рецепт, '
+            f'записей в ленте {entries}'
+        )
+        for strategy, timings in results.items():
+            percentiles = statistics.quantiles(timings, n=100)
+            self.stdout.write(
+                f'чтение ({strategy}): p50 {percentiles[49]:.2f} мс, '
+                f'p95 {percentiles[94]:.2f} мс'
+            )
+
+    @staticmethod
+    def fill_users(options):
+        prefix = f'bench{time.time_ns()}'
+        User.objects.bulk_create(
+            User(
+                username=f'{prefix}-{number}',
+                email=f'{prefix}-{number}@example.com',
+                first_name='bench',
+                last_name='bench',
+            )
+            for number in range(options['authors'] + options['followers'])
+        )
+        users = list(
+            User.objects.filter(username__startswith=f'{prefix}-')
+            .order_by('id').values_list('id', flat=True)
+        )
+        authors = users[:options['authors']]
+        followers = users[options['authors']:]
+        follows = min(options['follows_per_user'], len(authors))
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id in followers
+                for author_id in random.sample(authors, follows)
+            ),
+            batch_size=5000,
+        )
+        return authors, followers
+
+    @staticmethod
+    def publish(authors, per_author):
+        timings = []
+        for number in range(per_author):
+            for author_id in authors:
+                recipe = Recipe.objects.create(
+                    name=f'bench {number}',
+                    text='bench',
+                    cooking_time=1,
+                    author_id=author_id,
+                )
+                started = time.perf_counter()
+                feed.fan_out(recipe)
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    @staticmethod
+    def read(readers):
+        timings = []
+        for user_id in readers:
+            user = User(pk=user_id)
+            started = time.perf_counter()
+            list(feed.get_feed(user).values_list('id', flat=True)[:24])
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
@@ -0,0 +1,106 @@
+import csv
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import Ingredient
+from recipes.search import IngredientIndex, search_ingredients
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер поиска ингредиентов на данных из csv, размноженных до '
+        'заданного числа строк. Изменения в базе откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            type=str,
+            default=str(settings.BASE_DIR / 'data' / 'ingredients.csv'),
+            help='Путь к файлу',
+        )
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=300)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8') as csv_file:
+                source = [row[:2] for row in csv.reader(csv_file) if row]
+        except OSError as error:
+            raise CommandError(error)
+        if not source:
+            raise CommandError('Файл не содержит строк')
+        random.seed(options['seed'])
+        with transaction.atomic():
+            self.fill(source, options['rows'])
+            queries = self.sample_queries(source, options['queries'])
+            legacy = self.measure(
+                lambda query: list(
+                    Ingredient.objects.filter(name__istartswith=query)
+                ),
+                queries,
+            )
+            ranked = self.measure(
+                lambda query: search_ingredients(
+                    Ingredient.objects.all(), query
+                ),
+                queries,
+            )
+            index = IngredientIndex()
+            index.search('')
+            in_memory = self.measure(index.search, queries)
+            transaction.set_rollback(True)
+        self.report('istartswith, без ограничения', legacy)
+        self.report('search_ingredients', ranked)
+        self.report('IngredientIndex', in_memory)
+
+    @staticmethod
+    def fill(source, rows):
+        # Строки из csv обычно уже загружены в базу: повторы по
+        # unique_ingredient пропускаются.
+        batch = []
+        for number in range(rows):
+            name, unit = source[number % len(source)]
+            copy = number // len(source)
+            batch.append(Ingredient(
+                name=f'{name} {copy}' if copy else name,
+                measurement_unit=unit,
+            ))
+            if len(batch) == 5000:
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+
+    @staticmethod
+    def sample_queries(source, count):
+        queries = []
+        for _ in range(count):
+            name = random.choice(source)[0]
+            start = random.choice((0, 0, 0, len(name) // 2))
+            queries.append(name[start:start + random.randint(1, 4)])
+        return queries
+
+    @staticmethod
+    def measure(search, queries):
+        timings = []
+        sizes = []
+        for query in queries:
+            started = time.perf_counter()
+            sizes.append(len(search(query)))
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings, sizes
+
+    def report(self, title, result):
+        timings, sizes = result
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{title}: p50 {percentiles[49]:.3f} мс, '
+            f'p95 {percentiles[94]:.3f} мс, '
+            f'строк в среднем {statistics.mean(sizes):.0f}'
+        )
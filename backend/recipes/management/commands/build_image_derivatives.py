@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.thumbnails import build_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий изображений рецептов'
+
+    def handle(self, *args, **options):
+        names = (
+            Recipe.objects.exclude(image='').exclude(image=None)
+            .values_list('image', flat=True).iterator()
+        )
+        count = 0
+        for name in names:
+            try:
+                build_derivatives(name)
+            except Exception as error:
+                self.stdout.write(self.style.ERROR(f'{name}: {error}'))
+                continue
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'{count} Images Processed'))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    help = 'Расчёт похожих рецептов по совместному добавлению в избранное'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать все рецепты, а не только изменённые',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Сколько соседей хранить для каждого рецепта',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Сколько рецептов обрабатывать за один блок',
+        )
+        parser.add_argument(
+            '--max-user-favorites',
+            type=int,
+            default=1000,
+            help='Не учитывать пользователей с большим числом избранного',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count, full = similarity.refresh(
+            full=options['full'],
+            top=options['top'],
+            chunk_size=options['chunk_size'],
+            max_user_favorites=options['max_user_favorites'],
+        )
+        mode = 'полный пересчёт' if full else 'по журналу'
+        self.stdout.write(self.style.SUCCESS(
+            f'Similar Recipes Updated: {count} ({mode}), '
+            f'{time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,186 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from recipes import feed, fulltext, pantry, similarity
+from recipes.counters import COUNTERS, recount
+from recipes.models import (Favorite, Ingredient, IngredientsInRecipe, Recipe,
+                            ShoppingCart, Tag, TagsInRecipe)
+from recipes.versions import bump_version
+from users.models import Follow, User
+
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Генерация большого объёма тестовых данных для нагрузки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients-per-recipe',
+            type=int,
+            default=10,
+            help='Среднее число ингредиентов в рецепте',
+        )
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=50000)
+        parser.add_argument('--carts', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                'Нет ингредиентов: сначала выполните import_csv'
+            )
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in DEFAULT_TAGS
+            )
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+        self.step('users', self.create_users, options['users'])
+        user_ids = list(User.objects.values_list('id', flat=True))
+        if not user_ids:
+            raise CommandError('Нет пользователей для авторов рецептов')
+        self.step(
+            'recipes', self.create_recipes, options['recipes'], user_ids,
+            ingredient_ids, tag_ids, options['ingredients_per_recipe'],
+        )
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        self.step(
+            'follows', self.create_pairs, Follow, 'user', 'author',
+            options['follows'], user_ids, user_ids,
+        )
+        for model, key in ((Favorite, 'favorites'), (ShoppingCart, 'carts')):
+            self.step(
+                key, self.create_pairs, model, 'user', 'recipe',
+                options[key], user_ids, recipe_ids,
+            )
+        self.step('counters', self.finish)
+
+    def step(self, name, method, *args):
+        started = time.monotonic()
+        created = method(*args)
+        elapsed = time.monotonic() - started
+        message = f'{name}: {elapsed:.1f}s'
+        if created is not None:
+            message = f'{name}: {created} created in {elapsed:.1f}s'
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def insert(self, model, objects, ignore_conflicts=False):
+        model.objects.bulk_create(
+            objects,
+            batch_size=self.batch_size,
+            ignore_conflicts=ignore_conflicts,
+        )
+
+    def create_users(self, count):
+        password = make_password('password')
+        first = next_id(User)
+        for start in range(first, first + count, self.batch_size):
+            stop = min(start + self.batch_size, first + count)
+            self.insert(User, [
+                User(
+                    id=pk,
+                    username=f'user{pk}',
+                    email=f'user{pk}@example.com',
+                    first_name=f'Имя {pk}',
+                    last_name=f'Фамилия {pk}',
+                    password=password,
+                )
+                for pk in range(start, stop)
+            ])
+        return count
+
+    def create_recipes(self, count, user_ids, ingredient_ids, tag_ids,
+                       per_recipe):
+        choice, randint, sample = (
+            self.random.choice, self.random.randint, self.random.sample
+        )
+        high = min(per_recipe + per_recipe // 2, len(ingredient_ids))
+        low = min(max(1, per_recipe // 2), high)
+        first = next_id(Recipe)
+        for start in range(first, first + count, self.batch_size):
+            ids = range(start, min(start + self.batch_size, first + count))
+            with transaction.atomic():
+                self.insert(Recipe, [
+                    Recipe(
+                        id=pk,
+                        name=f'Рецепт {pk}',
+                        text=f'Описание рецепта {pk}',
+                        cooking_time=randint(1, 300),
+                        author_id=choice(user_ids),
+                    )
+                    for pk in ids
+                ])
+                self.insert(TagsInRecipe, [
+                    TagsInRecipe(recipe_id=pk, tag_id=tag_id)
+                    for pk in ids
+                    for tag_id in sample(tag_ids, randint(1, len(tag_ids)))
+                ])
+                self.insert(IngredientsInRecipe, [
+                    IngredientsInRecipe(
+                        recipe_id=pk,
+                        ingredient_id=ingredient_id,
+                        amount=randint(1, 1000),
+                    )
+                    for pk in ids
+                    for ingredient_id in sample(
+                        ingredient_ids, randint(low, high)
+                    )
+                ])
+        return count
+
+    def create_pairs(self, model, left, right, count, left_ids, right_ids):
+        """Случайные пары без повторов; уже существующие пропускаются."""
+        choice = self.random.choice
+        before = model.objects.count()
+        for start in range(0, count, self.batch_size):
+            pairs = set()
+            for _ in range(min(self.batch_size, count - start)):
+                pair = choice(left_ids), choice(right_ids)
+                if pair[0] != pair[1] or model is not Follow:
+                    pairs.add(pair)
+            self.insert(
+                model,
+                [model(**{f'{left}_id': a, f'{right}_id': b})
+                 for a, b in pairs],
+                ignore_conflicts=True,
+            )
+        return model.objects.count() - before
+
+    def finish(self):
+        models = [User, Recipe, TagsInRecipe, IngredientsInRecipe, Follow,
+                  Favorite, ShoppingCart]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        for counter in COUNTERS:
+            recount(counter)
+        fulltext.reindex()
+        pantry.ingredient_changes.log()
+        similarity.favorite_changes.log()
+        if settings.FEED_STRATEGY == 'write':
+            feed.rebuild()
+        bump_version('users', 'tags', 'recipes:catalog')
@@ -1,43 +1,137 @@
 import csv
-import sys
+import json
+import os
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from recipes.models import Ingredient
+from recipes.versions import bump_version
+
+MAX_LENGTH = Ingredient._meta.get_field('name').max_length
+
+
+def skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in ' \t\r\n,':
+        position += 1
+    return position
+
+
+def read_json(file, chunk_size=64 * 1024):
+    """Элементы JSON-массива по одному, без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидался JSON-массив')
+    buffer = buffer[1:]
+    while True:
+        chunk = file.read(chunk_size)
+        buffer += chunk
+        position = skip_separators(buffer, 0)
+        while position < len(buffer) and buffer[position] != ']':
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError as error:
+                if not chunk:
+                    raise CommandError(f'Некорректный JSON: {error}')
+                break
+            yield item
+            position = skip_separators(buffer, position)
+        if buffer[position:position + 1] == ']':
+            return
+        buffer = buffer[position:]
+        if not chunk:
+            raise CommandError('JSON-массив не закрыт')
+
+
+def parse(item):
+    if isinstance(item, dict):
+        item = (item.get('name'), item.get('measurement_unit'))
+    if not isinstance(item, (list, tuple)) or len(item) != 2:
+        return None
+    name, unit = item
+    if not isinstance(name, str) or not isinstance(unit, str):
+        return None
+    name, unit = name.strip(), unit.strip()
+    if not name or not unit or max(len(name), len(unit)) > MAX_LENGTH:
+        return None
+    return name, unit
 
 
 class Command(BaseCommand):
-    help = 'Импорт данных из csv в модель Ingredient'
+    help = 'Импорт ингредиентов из csv или json в модель Ingredient'
+    readers = {'.csv': csv.reader, '.json': read_json}
 
     def add_arguments(self, parser):
-        parser.add_argument('--path', type=str, help='Путь к файлу')
+        parser.add_argument(
+            '--path', type=str, required=True, help='Путь к файлу'
+        )
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'json'),
+            help='Формат файла, по умолчанию по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько строк обрабатывать за один запрос',
+        )
 
     def handle(self, *args, **options):
-        params_for_create = []
+        path = options['path']
+        extension = (
+            f'.{options["format"]}' if options['format']
+            else os.path.splitext(path)[1].lower()
+        )
+        reader = self.readers.get(extension)
+        if reader is None:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
 
+        inserted = existing = skipped = 0
+        started = time.monotonic()
         try:
-            file_path = options['path']
-            with open(file_path, 'r', encoding='utf-8') as csv_file:
-                reader = csv.reader(csv_file)
-                for row in reader:
-                    #unit_obj, created = Ingredient.objects.get_or_create(name=row[1])
-                    params = {
-                        'name': row[0],
-                        'measurement_unit': row[1],
-                    }
-                    params_for_create.append(params)
-
-            Ingredient.objects.bulk_create(
-                [Ingredient(**parameters) for parameters in params_for_create]
-            )
-        except Exception as error:
-            self.stdout.write(
-                self.style.ERROR(f'Error loading model {error}'),
-            )
-            sys.exit()
-
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'{len(params_for_create)}' ' Ingredient Objects Created'
-            )
+            with open(path, 'r', encoding='utf-8', newline='') as file:
+                items = reader(file)
+                while True:
+                    batch = list(islice(items, options['batch_size']))
+                    if not batch:
+                        break
+                    rows = [parse(item) for item in batch]
+                    keys = set(filter(None, rows))
+                    skipped += len(rows) - len(keys)
+                    added = self.upsert(keys)
+                    inserted += added
+                    existing += len(keys) - added
+        except (OSError, UnicodeDecodeError, csv.Error) as error:
+            raise CommandError(f'Ошибка чтения {path}: {error}')
+        if inserted:
+            bump_version('ingredients')
+
+        elapsed = time.monotonic() - started
+        total = inserted + existing + skipped
+        self.stdout.write(self.style.SUCCESS(
+            f'{inserted} inserted, {existing} already present, '
+            f'{skipped} skipped in {elapsed:.1f}s '
+            f'({total / max(elapsed, 1e-6):.0f} rows/s)'
+        ))
+
+    def upsert(self, keys):
+        """Добавляет отсутствующие пары (название, единица измерения)."""
+        if not keys:
+            return 0
+        present = set(
+            Ingredient.objects.filter(
+                name__in={name for name, _ in keys}
+            ).values_list('name', 'measurement_unit')
+        )
+        new = keys - present
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in new],
+            ignore_conflicts=True,
         )
+        return len(new)
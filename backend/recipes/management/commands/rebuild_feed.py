@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes import feed
+
+
+class Command(BaseCommand):
+    help = 'Заполнение таблицы ленты (FEED_STRATEGY = write) по подпискам'
+
+    def handle(self, *args, **options):
+        feed.rebuild()
+        self.stdout.write(self.style.SUCCESS('Feed Rebuilt'))
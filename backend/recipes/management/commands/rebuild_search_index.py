@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes import fulltext
+
+
+class Command(BaseCommand):
+    help = 'Полная перестройка поискового индекса рецептов'
+
+    def handle(self, *args, **options):
+        fulltext.reindex()
+        self.stdout.write(self.style.SUCCESS('Search Index Rebuilt'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import COUNTERS, drift, recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков рецептов, избранного и корзин'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать расхождения, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        for counter in COUNTERS:
+            name = f'{counter.model.__name__}.{counter.field}'
+            drifted = drift(counter).count()
+            if options['check']:
+                style = self.style.ERROR if drifted else self.style.SUCCESS
+                self.stdout.write(style(f'{name}: {drifted} drifted'))
+                continue
+            recount(counter)
+            self.stdout.write(
+                self.style.SUCCESS(f'{name}: {drifted} fixed')
+            )
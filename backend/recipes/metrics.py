@@ -0,0 +1,201 @@
+"""Метрики процесса в текстовом формате Prometheus.
+
+Каждый процесс копит значения в памяти и не чаще раза в
+``METRICS_FLUSH_INTERVAL`` секунд записывает их в ``METRICS_DIR/<pid>.json``;
+при выдаче метрик файлы всех процессов складываются. Без ``METRICS_DIR``
+отдаются значения только текущего процесса.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from glob import glob
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+    return f'{{{pairs}}}'
+
+
+def format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Metric:
+
+    def __init__(self, registry, name, documentation):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, buckets):
+        super().__init__(registry, name, documentation)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        # Счётчики корзин хранятся без накопления: последний элемент — сумма,
+        # предпоследний — значения больше последней границы.
+        values = [0] * (len(self.buckets) + 2)
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if value <= bound),
+            len(self.buckets),
+        )
+        values[index] = 1
+        values[-1] = value
+        self.registry.add(self.name, labels, values)
+
+    def samples(self, labels, values):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), values):
+            total += count
+            yield (
+                f'{self.name}_bucket'
+                f'{format_labels(labels + (("le", bound),))}', total
+            )
+        yield f'{self.name}_sum{format_labels(labels)}', values[-1]
+        yield f'{self.name}_count{format_labels(labels)}', total
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.add(self.name, labels, [amount])
+
+    def value(self, **labels):
+        key = (self.name, tuple(sorted(labels.items())))
+        return self.registry.collect().get(key, [0])[0]
+
+    def samples(self, labels, values):
+        yield f'{self.name}{format_labels(labels)}', values[0]
+
+
+class Gauge(Metric):
+    """Значение, которое вычисляется в момент выдачи метрик."""
+    type = 'gauge'
+
+    def __init__(self, registry, name, documentation, function):
+        super().__init__(registry, name, documentation)
+        self.function = function
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+        self.values = {}
+        self.lock = threading.Lock()
+        self.flushed = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(self, name, documentation, buckets))
+
+    def counter(self, name, documentation):
+        return self.register(Counter(self, name, documentation))
+
+    def gauge(self, name, documentation, function):
+        return self.register(Gauge(self, name, documentation, function))
+
+    def add(self, name, labels, values):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            current = self.values.setdefault(key, [0] * len(values))
+            for index, value in enumerate(values):
+                current[index] += value
+        self.flush()
+
+    def flush(self, force=False):
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (
+            not force and now - self.flushed < settings.METRICS_FLUSH_INTERVAL
+        ):
+            return
+        with self.lock:
+            self.flushed = now
+            rows = [
+                [name, labels, values]
+                for (name, labels), values in self.values.items()
+            ]
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(temporary, 'w', encoding='utf-8') as file:
+                json.dump(rows, file, ensure_ascii=False)
+            os.replace(temporary, path)
+        except OSError:
+            logger.exception('Не удалось записать метрики в %s', path)
+
+    def collect(self):
+        """Значения всех процессов, сложенные по имени и меткам."""
+        if not settings.METRICS_DIR:
+            with self.lock:
+                return {key: list(values) for key, values in
+                        self.values.items()}
+        self.flush(force=True)
+        merged = {}
+        for path in glob(os.path.join(settings.METRICS_DIR, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as file:
+                    rows = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, labels, values in rows:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                current = merged.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    current[index] += value
+        return merged
+
+    def render(self):
+        samples = {}
+        for (name, labels), values in sorted(self.collect().items()):
+            samples.setdefault(name, []).append((labels, values))
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            if isinstance(metric, Gauge):
+                lines.append(f'{name} {format_value(metric.function())}')
+                continue
+            for labels, values in samples.get(name, ()):
+                lines.extend(
+                    f'{sample} {format_value(value)}'
+                    for sample, value in metric.samples(labels, values)
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+atexit.register(registry.flush, force=True)
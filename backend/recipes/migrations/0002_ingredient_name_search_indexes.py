@@ -0,0 +1,48 @@
+from django.db import migrations
+
+POSTGRESQL_FORWARD = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX ingredient_name_prefix_idx ON recipes_ingredient '
+    '(UPPER(name::text) text_pattern_ops)',
+    'CREATE INDEX ingredient_name_trgm_idx ON recipes_ingredient '
+    'USING gin (UPPER(name::text) gin_trgm_ops)',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS ingredient_name_prefix_idx',
+    'DROP INDEX IF EXISTS ingredient_name_trgm_idx',
+)
+SQLITE_FORWARD = (
+    'CREATE INDEX ingredient_name_prefix_idx ON recipes_ingredient '
+    '(name COLLATE NOCASE)',
+)
+SQLITE_BACKWARD = (
+    'DROP INDEX IF EXISTS ingredient_name_prefix_idx',
+)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, ()):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({
+                'postgresql': POSTGRESQL_FORWARD,
+                'sqlite': SQLITE_FORWARD,
+            }),
+            run({
+                'postgresql': POSTGRESQL_BACKWARD,
+                'sqlite': SQLITE_BACKWARD,
+            }),
+        ),
+    ]
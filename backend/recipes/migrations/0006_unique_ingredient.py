@@ -0,0 +1,46 @@
+# Generated by Django 3.2.18 on 2026-10-18 17:38
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientsInRecipe = apps.get_model('recipes', 'IngredientsInRecipe')
+    groups = list(
+        Ingredient.objects.order_by().values('name', 'measurement_unit')
+        .annotate(first=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for group in groups:
+        duplicates = Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=group['first'])
+        rows = IngredientsInRecipe.objects.filter(ingredient__in=duplicates)
+        for row in rows:
+            kept = IngredientsInRecipe.objects.filter(
+                recipe_id=row.recipe_id, ingredient_id=group['first']
+            ).first()
+            if kept is None:
+                row.ingredient_id = group['first']
+                row.save(update_fields=['ingredient'])
+                continue
+            kept.amount = min(kept.amount + row.amount, 1000)
+            kept.save(update_fields=['amount'])
+            row.delete()
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_unique_favorite_shopping_cart'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+POSTGRESQL_FORWARD = (
+    'CREATE TABLE recipes_recipe_search ('
+    'recipe_id bigint PRIMARY KEY REFERENCES recipes_recipe (id) '
+    'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+    'document tsvector NOT NULL)',
+    'CREATE INDEX recipe_search_document_idx ON recipes_recipe_search '
+    'USING gin (document)',
+    "INSERT INTO recipes_recipe_search (recipe_id, document) "
+    "SELECT r.id, "
+    "setweight(to_tsvector('russian', r.name), 'A') "
+    "|| setweight(to_tsvector("
+    "'russian', coalesce(string_agg(i.name, ' '), '')), 'B') "
+    "|| setweight(to_tsvector('russian', r.text), 'C') "
+    "FROM recipes_recipe r "
+    "LEFT JOIN recipes_ingredientsinrecipe ri ON ri.recipe_id = r.id "
+    "LEFT JOIN recipes_ingredient i ON i.id = ri.ingredient_id "
+    "GROUP BY r.id",
+)
+POSTGRESQL_BACKWARD = (
+    'DROP TABLE IF EXISTS recipes_recipe_search',
+)
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE recipes_recipe_search USING fts5('
+    "name, ingredients, text, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO recipes_recipe_search (rowid, name, ingredients, text) "
+    "SELECT r.id, r.name, coalesce(group_concat(i.name, ' '), ''), r.text "
+    "FROM recipes_recipe r "
+    "LEFT JOIN recipes_ingredientsinrecipe ri ON ri.recipe_id = r.id "
+    "LEFT JOIN recipes_ingredient i ON i.id = ri.ingredient_id "
+    "GROUP BY r.id",
+)
+SQLITE_BACKWARD = (
+    'DROP TABLE IF EXISTS recipes_recipe_search',
+)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, ()):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({
+                'postgresql': POSTGRESQL_FORWARD,
+                'sqlite': SQLITE_FORWARD,
+            }),
+            run({
+                'postgresql': POSTGRESQL_BACKWARD,
+                'sqlite': SQLITE_BACKWARD,
+            }),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.18 on 2026-10-18 18:27
+
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def mark_built_derivatives(apps, schema_editor):
+    # Копии, построенные до появления отметки, ищутся в хранилище один
+    # раз; копии пишутся по порядку, поэтому проверяется последняя.
+    Recipe = apps.get_model('recipes', 'Recipe')
+    *_, last = settings.RECIPE_IMAGE_SIZES
+    extension = settings.RECIPE_IMAGE_FORMAT.lower()
+    names = (
+        Recipe.objects.exclude(image='').exclude(image=None)
+        .values_list('image', flat=True).distinct().iterator()
+    )
+    for name in names:
+        root, _ = os.path.splitext(name)
+        if default_storage.exists(f'{root}_{last}.{extension}'):
+            Recipe.objects.filter(image=name).update(image_derivatives=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipesimilarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_derivatives',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Изображение с готовыми копиями'),
+        ),
+        migrations.RunPython(
+            mark_built_derivatives, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.18 on 2026-10-18 18:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Документ связан с рецептом колонкой rowid, как в таблице FTS5 в SQLite.
+POSTGRESQL_FORWARD = (
+    'ALTER TABLE recipes_recipe_search RENAME COLUMN recipe_id TO rowid',
+)
+POSTGRESQL_BACKWARD = (
+    'ALTER TABLE recipes_recipe_search RENAME COLUMN rowid TO recipe_id',
+)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeDocument',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='recipes.recipe')),
+            ],
+            options={
+                'db_table': 'recipes_recipe_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(
+            run(POSTGRESQL_FORWARD), run(POSTGRESQL_BACKWARD)
+        ),
+    ]
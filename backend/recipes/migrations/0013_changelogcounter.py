@@ -0,0 +1,37 @@
+# Generated by Django 3.2.18 on 2026-10-18 18:43
+
+from django.core.cache import cache
+from django.db import migrations, models
+
+LOGS = ('recipe_ingredients', 'favorites')
+
+
+def copy_cache_counters(apps, schema_editor):
+    # Читатели помнят номера из кеша: нумерация продолжается с них.
+    ChangeLogCounter = apps.get_model('recipes', 'ChangeLogCounter')
+    ChangeLogCounter.objects.bulk_create(
+        ChangeLogCounter(name=name, number=cache.get(f'changes:{name}', 0))
+        for name in LOGS
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('number', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Счётчик журнала изменений',
+                'verbose_name_plural': 'Счётчики журналов изменений',
+            },
+        ),
+        migrations.RunPython(copy_cache_counters, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from users.models import User
+from itertools import chain
+
+from django.db import connections, models
+from django.db.models import Exists, F, OuterRef, Prefetch, Window
+from django.db.models.functions import RowNumber
+from users.models import Follow, User
 
 
 class Tag(models.Model):
@@ -25,11 +29,94 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def read_plan(self, user=None):
+        """Рецепты со всеми данными для полного сериализатора.
+
+        Теги, ингредиенты и автор загружаются фиксированным числом
+        запросов; для авторизованного пользователя добавляются флаги
+        избранного, корзины и подписки на автора.
+        """
+        queryset = self.prefetch_related(
+            'tags',
+            Prefetch(
+                'recipes',
+                queryset=IngredientsInRecipe.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+        if user is None or user.is_anonymous:
+            return queryset.select_related('author')
+        authors = User.objects.annotate(
+            is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('pk'))
+            )
+        )
+        return queryset.annotate(
+            favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        ).prefetch_related(Prefetch('author', queryset=authors))
+
+    def minified(self):
+        """Только поля краткого представления рецепта."""
+        return self.only(
+            'id', 'name', 'image', 'image_derivatives', 'cooking_time',
+            'author',
+        )
+
+    def latest_by_author(self, author_ids, limit=None):
+        """Последние ``limit`` рецептов каждого автора одним запросом.
+
+        Использует ROW_NUMBER() OVER (PARTITION BY author_id); если база
+        не поддерживает оконные функции, выполняет запрос на автора.
+        Возвращает словарь ``{author_id: [recipe, ...]}``.
+        """
+        recipes = {author_id: [] for author_id in author_ids}
+        if not recipes or limit == 0:
+            return recipes
+        queryset = self.minified().filter(author_id__in=recipes)
+        if limit is None:
+            rows = queryset.order_by('-id')
+        elif connections[self.db].features.supports_over_clause:
+            sql, params = queryset.annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=F('id').desc(),
+                )
+            ).order_by().query.sql_with_params()
+            rows = self.raw(
+                f'SELECT * FROM ({sql}) ranked WHERE position <= %s '
+                'ORDER BY id DESC',
+                params + (limit,),
+            )
+        else:
+            rows = chain.from_iterable(
+                queryset.filter(author_id=author_id).order_by('-id')[:limit]
+                for author_id in recipes
+            )
+        for recipe in rows:
+            recipes[recipe.author_id].append(recipe)
+        return recipes
+
+
 class Recipe(models.Model):
     name = models.CharField(max_length=200)
     text = models.TextField()
@@ -64,6 +151,29 @@ class Recipe(models.Model):
         through='TagsInRecipe',
         verbose_name='Теги'
     )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+    )
+    cart_count = models.PositiveIntegerField(
+        'В корзинах',
+        default=0,
+        editable=False,
+    )
+    image_derivatives = models.CharField(
+        'Изображение с готовыми копиями',
+        max_length=100,
+        blank=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    # Обновляются отдельными UPDATE из сигналов и фоновых задач.
+    DENORMALIZED_FIELDS = (
+        'favorites_count', 'cart_count', 'image_derivatives'
+    )
 
     class Meta:
         ordering = ['-id']
@@ -74,10 +184,28 @@ class Recipe(models.Model):
                 fields=('name', 'author'),
                 name='recipe_name_unique')
         ]
+        indexes = [
+            models.Index(
+                fields=('author', '-id'), name='recipe_author_id_idx'
+            ),
+            models.Index(fields=('-pub_date',), name='recipe_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Полное сохранение загруженного ранее экземпляра не должно
+        # затирать счётчики и маску устаревшими значениями.
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class IngredientsInRecipe(models.Model):
     recipe = models.ForeignKey(
@@ -133,6 +261,11 @@ class TagsInRecipe(models.Model):
         ordering = ['id']
         verbose_name = 'Теги на рецептах'
         verbose_name_plural = 'Теги на рецептах'
+        indexes = [
+            models.Index(
+                fields=('tag', 'recipe'), name='tags_in_recipe_tag_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'TR: {self.tag.name}->{self.recipe.name}'[:30]
@@ -154,6 +287,12 @@ class Favorite(models.Model):
         ordering = ['id']
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_favorite'
+            )
+        ]
 
     def __str__(self) -> str:
         return f'Fav: {self.user.username}->{self.recipe.name}'[:30]
@@ -175,6 +314,108 @@ class ShoppingCart(models.Model):
         ordering = ['id']
         verbose_name = 'Покупки'
         verbose_name_plural = 'Покупки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_shopping_cart'
+            )
+        ]
 
     def __str__(self) -> str:
         return f'Shp: {self.user.username}->{self.recipe.name}'[:30]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-id']
+        verbose_name = 'Лента'
+        verbose_name_plural = 'Лента'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date'),
+                name='feed_user_pub_date_idx'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'Feed: {self.user.username}->{self.recipe.name}'[:30]
+
+
+class RecipeSimilarity(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        ordering = ['recipe', '-score']
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_recipe_similarity'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'Sim: {self.recipe_id}->{self.similar_id}'
+
+
+class ChangeLogCounter(models.Model):
+    """Номер последней записи журнала ``recipes.changes.ChangeLog``."""
+    name = models.CharField(max_length=50, primary_key=True)
+    number = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Счётчик журнала изменений'
+        verbose_name_plural = 'Счётчики журналов изменений'
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.number}'
+
+
+class RecipeDocument(models.Model):
+    """Документ рецепта в индексе полнотекстового поиска.
+
+    Таблицу создают и заполняют миграции и ``recipes.fulltext``: в
+    PostgreSQL — обычная таблица с колонкой ``document``, в SQLite —
+    виртуальная таблица FTS5. Модель нужна, чтобы присоединять индекс
+    к выборке рецептов.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search_document',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_search'
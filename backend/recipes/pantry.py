@@ -0,0 +1,137 @@
+"""Подбор рецептов по ингредиентам, которые есть у пользователя.
+
+Воркер держит в памяти обратный индекс: для каждого ингредиента —
+отсортированный массив id рецептов, где он встречается, и число
+ингредиентов каждого рецепта. Изменения состава рецептов пишутся в журнал
+``ingredient_changes``; воркер, заметив новые записи, перечитывает из базы
+только затронутые рецепты.
+"""
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from operator import neg, sub
+
+from recipes.changes import ChangeLog
+from recipes.models import IngredientsInRecipe
+
+# Сколько записей журнала и сколько рецептов воркер готов обновить
+# по одному; при большем отставании индекс строится заново.
+CHANGES_LIMIT = 1000
+BATCH_SIZE = 10000
+
+ingredient_changes = ChangeLog('recipe_ingredients', CHANGES_LIMIT)
+
+
+class PantryIndex:
+    """Обратный индекс ингредиент -> рецепты в памяти воркера.
+
+    Снимок ``(номер журнала, postings, sizes)`` заменяется целиком, поэтому
+    чтение идёт без блокировки: ``postings`` — словарь id ингредиента ->
+    ``array('l')`` id рецептов по возрастанию, ``sizes`` — ``array('H')``
+    числа ингредиентов по id рецепта.
+    """
+
+    def __init__(self):
+        self._snapshot = (None, {}, array('H'))
+        self._lock = threading.Lock()
+
+    def _load(self):
+        number = ingredient_changes.last()
+        if number == self._snapshot[0]:
+            return self._snapshot
+        with self._lock:
+            applied = self._snapshot[0]
+            if number != applied:
+                changed = ingredient_changes.since(applied, number)
+                if changed is None or len(changed) > CHANGES_LIMIT:
+                    self._snapshot = (number, *self._build())
+                else:
+                    self._snapshot = (number, *self._update(changed))
+        return self._snapshot
+
+    def _rows(self, recipe_ids=None):
+        # По возрастанию id рецепта: массивы в postings получаются
+        # отсортированными без отдельной сортировки.
+        rows = IngredientsInRecipe.objects.order_by('recipe_id')
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        return rows.values_list('ingredient_id', 'recipe_id').iterator(
+            chunk_size=BATCH_SIZE
+        )
+
+    def _build(self):
+        postings = defaultdict(lambda: array('l'))
+        sizes = array('H')
+        for ingredient_id, recipe_id in self._rows():
+            postings[ingredient_id].append(recipe_id)
+            _grow(sizes, recipe_id)
+            sizes[recipe_id] += 1
+        return dict(postings), sizes
+
+    def _update(self, changed):
+        _, postings, sizes = self._snapshot
+        postings = dict(postings)
+        sizes = array('H', sizes)
+        removed = set(changed)
+        for ingredient_id, recipe_ids in postings.items():
+            if any(_contains(recipe_ids, pk) for pk in changed):
+                postings[ingredient_id] = array('l', (
+                    recipe_id for recipe_id in recipe_ids
+                    if recipe_id not in removed
+                ))
+        for recipe_id in changed:
+            if recipe_id < len(sizes):
+                sizes[recipe_id] = 0
+        added = defaultdict(list)
+        for ingredient_id, recipe_id in self._rows(changed):
+            added[ingredient_id].append(recipe_id)
+        for ingredient_id, recipe_ids in added.items():
+            posting = array('l', postings.get(ingredient_id, ()))
+            for recipe_id in recipe_ids:
+                insort(posting, recipe_id)
+                _grow(sizes, recipe_id)
+                sizes[recipe_id] += 1
+            postings[ingredient_id] = posting
+        return postings, sizes
+
+    def match(self, ingredient_ids, limit, max_missing=None):
+        """Лучшие ``limit`` рецептов для набора ``ingredient_ids``.
+
+        Возвращает тройки ``(id рецепта, найдено, не хватает)``: сначала
+        рецепты с наименьшим числом недостающих ингредиентов, при равенстве —
+        с большей долей имеющихся, затем более новые.
+        """
+        _, postings, sizes = self._load()
+        hits = Counter()
+        for ingredient_id in set(ingredient_ids):
+            hits.update(postings.get(ingredient_id, ()))
+        recipe_ids = list(hits)
+        found = list(hits.values())
+        missing = map(sub, map(sizes.__getitem__, recipe_ids), found)
+        candidates = zip(missing, map(neg, found), map(neg, recipe_ids))
+        if max_missing is not None:
+            candidates = (
+                candidate for candidate in candidates
+                if candidate[0] <= max_missing
+            )
+        return [
+            (-recipe_id, -found, missing)
+            for missing, found, recipe_id in heapq.nsmallest(
+                limit, candidates
+            )
+        ]
+
+
+def _grow(sizes, recipe_id):
+    if recipe_id >= len(sizes):
+        sizes.frombytes(bytes(sizes.itemsize * (recipe_id + 1 - len(sizes))))
+
+
+def _contains(recipe_ids, recipe_id):
+    position = bisect_left(recipe_ids, recipe_id)
+    return position < len(recipe_ids) and recipe_ids[position] == recipe_id
+
+
+pantry_index = PantryIndex()
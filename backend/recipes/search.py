@@ -0,0 +1,80 @@
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+from recipes.versions import get_version
+
+
+def search_ingredients(queryset, query, limit=None):
+    """Ингредиенты по началу названия, затем по вхождению.
+
+    Совпадения по префиксу идут первыми и ищутся по индексу
+    ``ingredient_name_prefix_idx``; поиск по подстроке выполняется, только
+    если префиксных совпадений меньше ``limit``.
+    """
+    limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+    found = list(
+        queryset.filter(name__istartswith=query).order_by('name')[:limit]
+    )
+    if len(found) < limit:
+        found.extend(
+            queryset.filter(name__icontains=query)
+            .exclude(name__istartswith=query)
+            .order_by('name')[:limit - len(found)]
+        )
+    return found
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти воркера.
+
+    Строится при первом обращении и перестраивается, когда меняется
+    версия ``ingredients`` (см. ``recipes.versions``). Порядок выдачи тот
+    же, что у ``search_ingredients``.
+    """
+
+    def __init__(self):
+        self._snapshot = (None, [], [])
+        self._lock = threading.Lock()
+
+    def _load(self):
+        version = get_version('ingredients')
+        if version == self._snapshot[0]:
+            return self._snapshot
+        with self._lock:
+            if version != self._snapshot[0]:
+                rows = sorted(
+                    Ingredient.objects.values(
+                        'id', 'name', 'measurement_unit'
+                    ).iterator(),
+                    key=lambda row: row['name'].casefold(),
+                )
+                keys = [row['name'].casefold() for row in rows]
+                self._snapshot = (version, keys, rows)
+        return self._snapshot
+
+    def search(self, query, limit=None):
+        limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+        query = query.casefold()
+        _, keys, rows = self._load()
+        found = []
+        position = bisect_left(keys, query)
+        while (
+            len(found) < limit
+            and position < len(keys)
+            and keys[position].startswith(query)
+        ):
+            found.append(rows[position])
+            position += 1
+        if len(found) < limit:
+            for key, row in zip(keys, rows):
+                if query in key and not key.startswith(query):
+                    found.append(row)
+                    if len(found) == limit:
+                        break
+        return found
+
+
+ingredient_index = IngredientIndex()
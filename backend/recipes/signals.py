@@ -0,0 +1,231 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from recipes import feed, fulltext, pantry
+from recipes.counters import entries_removed, get_counter, recount, shift
+from recipes.models import (Favorite, Ingredient, IngredientsInRecipe, Recipe,
+                            ShoppingCart, Tag, TagsInRecipe)
+from recipes.similarity import favorite_changes
+from recipes.tasks import schedule
+from recipes.thumbnails import derivatives_ready, schedule_derivatives
+from recipes.versions import bump_version, recipe_families
+from users.models import Follow, User
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    if not instance.image or derivatives_ready(instance):
+        return
+    name = instance.image.name
+    transaction.on_commit(lambda: schedule_derivatives(name))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_version('ingredients', 'recipes:catalog')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version('tags', 'recipes:catalog')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(pre_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    bump_version(*recipe_families(instance.pk))
+
+
+@receiver(post_save, sender=IngredientsInRecipe)
+@receiver(post_delete, sender=IngredientsInRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    bump_version(*recipe_families(instance.recipe_id))
+
+
+@receiver(post_save, sender=TagsInRecipe)
+@receiver(post_delete, sender=TagsInRecipe)
+def recipe_tag_changed(sender, instance, **kwargs):
+    bump_version(*recipe_families(instance.recipe_id, (instance.tag_id,)))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('pre_clear', 'post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        bump_version('recipes:all', *(f'recipe:{pk}' for pk in pk_set or ()))
+        return
+    tag_ids = pk_set if sender is Recipe.tags.through and pk_set else ()
+    bump_version(*recipe_families(instance.pk, tag_ids))
+
+
+def reindex_on_commit(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: fulltext.reindex(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_document_changed(sender, instance, **kwargs):
+    reindex_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=IngredientsInRecipe)
+@receiver(post_delete, sender=IngredientsInRecipe)
+def recipe_ingredient_document_changed(sender, instance, **kwargs):
+    reindex_on_commit([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_document_changed(sender, instance, action, reverse,
+                                        pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    reindex_on_commit(pk_set or () if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if not created:
+        reindex_on_commit(
+            IngredientsInRecipe.objects.filter(ingredient=instance)
+            .values_list('recipe_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_pantry_changed(sender, instance, created=True, **kwargs):
+    if created:
+        pantry.ingredient_changes.log([instance.pk])
+
+
+@receiver(post_save, sender=IngredientsInRecipe)
+@receiver(post_delete, sender=IngredientsInRecipe)
+def recipe_ingredient_pantry_changed(sender, instance, **kwargs):
+    pantry.ingredient_changes.log([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_pantry_changed(sender, instance, action, reverse,
+                                      pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    pantry.ingredient_changes.log(pk_set or () if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_list_changed(sender, instance, **kwargs):
+    # Счётчик в закешированных списках может отставать на время жизни
+    # кеша; полная инвалидация семейств на каждое избранное дороже.
+    bump_version(f'user:{instance.user_id}', f'recipe:{instance.recipe_id}')
+
+
+@receiver(entries_removed, sender=Favorite)
+@receiver(entries_removed, sender=ShoppingCart)
+def recipe_list_entries_removed(sender, user_id, recipe_ids, **kwargs):
+    bump_version(f'user:{user_id}', *(f'recipe:{pk}' for pk in recipe_ids))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorite_changed(sender, instance, **kwargs):
+    favorite_changes.log([instance.recipe_id])
+
+
+@receiver(entries_removed, sender=Favorite)
+def favorites_removed(sender, recipe_ids, **kwargs):
+    favorite_changes.log(recipe_ids)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    bump_version(f'user:{instance.user_id}')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def counted_created(sender, instance, created, **kwargs):
+    if created:
+        shift(get_counter(sender), instance, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def counted_deleted(sender, instance, **kwargs):
+    shift(get_counter(sender), instance, -1)
+
+
+@receiver(entries_removed, sender=Favorite)
+@receiver(entries_removed, sender=ShoppingCart)
+def counted_removed(sender, recipe_ids, **kwargs):
+    recount(get_counter(sender), Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_author_changing(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    instance.previous_author_id = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list('author_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_author_changed(sender, instance, created, **kwargs):
+    previous = getattr(instance, 'previous_author_id', None)
+    if created or previous in (None, instance.author_id):
+        return
+    User.objects.filter(pk=previous).update(
+        recipes_count=F('recipes_count') - 1
+    )
+    User.objects.filter(pk=instance.author_id).update(
+        recipes_count=F('recipes_count') + 1
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, created=False, update_fields=None,
+                 **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    names = ['users']
+    if not created and instance.recipes.exists():
+        names.append('recipes:catalog')
+    bump_version(*names)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created and settings.FEED_STRATEGY == 'write':
+        # Рассылка по подписчикам популярного автора — тысячи вставок:
+        # она идёт в фоновом потоке, а не в запросе на публикацию.
+        transaction.on_commit(lambda: schedule(feed.fan_out, instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created and settings.FEED_STRATEGY == 'write':
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if settings.FEED_STRATEGY == 'write':
+        feed.forget(instance.user_id, instance.author_id)
@@ -0,0 +1,205 @@
+"""Похожие рецепты по совместному добавлению в избранное.
+
+Избранное — матрица пользователи × рецепты из нулей и единиц. Сходство
+двух рецептов — косинус между их столбцами: число общих пользователей,
+делённое на корень из произведения числа добавлений. Для каждого рецепта
+в ``RecipeSimilarity`` хранится ``top`` ближайших соседей.
+
+Произведение матриц считается блоками по ``chunk_size`` рецептов, так что
+в памяти одновременно только избранное и один блок сходств. Изменения
+избранного пишутся в журнал ``favorite_changes``; ``refresh`` без ``full``
+пересчитывает только строки, которые от них зависят.
+"""
+from itertools import chain
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+from scipy import sparse
+
+from recipes.changes import ChangeLog
+from recipes.models import Favorite, RecipeSimilarity
+
+APPLIED_KEY = 'similarity:applied'
+CHANGES_LIMIT = 100000
+BATCH_SIZE = 10000
+COLUMNS = ('recipe_id', 'similar_id', 'score')
+# Рекомендации строятся по последним избранным рецептам пользователя.
+RECENT_FAVORITES = 100
+
+favorite_changes = ChangeLog('favorites', CHANGES_LIMIT)
+
+
+def load_favorites(max_user_favorites=None):
+    """Избранное как CSR-матрица: строки — пользователи, столбцы — рецепты.
+
+    Номера строк и столбцов совпадают с id. Пользователи, у которых в
+    избранном больше ``max_user_favorites`` рецептов, не учитываются: они
+    дают квадратичное число пар и почти не несут сигнала.
+    """
+    rows = Favorite.objects.order_by().values_list(
+        'user_id', 'recipe_id'
+    ).iterator(chunk_size=BATCH_SIZE)
+    pairs = np.fromiter(chain.from_iterable(rows), dtype=np.int64)
+    users, recipes = pairs[0::2], pairs[1::2]
+    if max_user_favorites:
+        keep = np.bincount(users)[users] <= max_user_favorites
+        users, recipes = users[keep], recipes[keep]
+    return sparse.csr_matrix(
+        (np.ones(len(users), dtype=np.float32), (users, recipes)),
+        shape=(users.max(initial=0) + 1, recipes.max(initial=0) + 1),
+    )
+
+
+def normalize(matrix):
+    """Матрица со столбцами единичной длины и она же по строкам-рецептам."""
+    counts = np.asarray(matrix.sum(axis=0)).ravel()
+    scale = np.zeros_like(counts)
+    scale[counts > 0] = 1 / np.sqrt(counts[counts > 0])
+    normalized = (matrix @ sparse.diags(scale)).tocsr()
+    return normalized, normalized.T.tocsr()
+
+
+def neighbours(normalized, by_recipe, recipe_ids, top):
+    """Пары ``(id рецепта, [(id соседа, сходство), ...])`` для блока.
+
+    Соседи отсортированы по убыванию сходства; у рецептов без избранного
+    список пуст.
+    """
+    known = [pk for pk in recipe_ids if pk < by_recipe.shape[0]]
+    block = (by_recipe[known] @ normalized).tocsr()
+    rows = dict.fromkeys(recipe_ids, [])
+    for row, recipe_id in enumerate(known):
+        start, end = block.indptr[row], block.indptr[row + 1]
+        ids, scores = block.indices[start:end], block.data[start:end]
+        keep = ids != recipe_id
+        ids, scores = ids[keep], scores[keep]
+        if len(ids) > top:
+            best = np.argpartition(-scores, top - 1)[:top]
+            ids, scores = ids[best], scores[best]
+        order = np.lexsort((-ids, -scores))
+        rows[recipe_id] = list(zip(ids[order].tolist(),
+                                   scores[order].tolist()))
+    return rows.items()
+
+
+def store(rows):
+    """Заменяет сохранённых соседей рецептов из ``rows``.
+
+    Строки вставляются сырым многострочным INSERT: на миллионах пар
+    создание моделей для ``bulk_create`` обходится дороже самой записи.
+    """
+    recipe_ids = [recipe_id for recipe_id, _ in rows]
+    if not recipe_ids:
+        return
+    values = [
+        (recipe_id, similar_id, score)
+        for recipe_id, similar in rows
+        for similar_id, score in similar
+    ]
+    size = max(
+        min(BATCH_SIZE, connection.ops.bulk_batch_size(COLUMNS, values)), 1
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        RecipeSimilarity.objects.filter(recipe_id__in=recipe_ids).delete()
+        for start in range(0, len(values), size):
+            batch = values[start:start + size]
+            cursor.execute(
+                f'INSERT INTO {RecipeSimilarity._meta.db_table} '
+                f'({", ".join(COLUMNS)}) VALUES '
+                + ', '.join(['(%s, %s, %s)'] * len(batch)),
+                list(chain.from_iterable(batch)),
+            )
+
+
+def affected(matrix, changed):
+    """Рецепты, у которых могли измениться соседи.
+
+    Это сами ``changed``, рецепты с общими с ними пользователями (у них
+    изменилось сходство с ``changed``) и рецепты, у которых ``changed``
+    сейчас в соседях (общих пользователей могло не остаться).
+    """
+    changed = np.asarray(changed, dtype=np.int64)
+    columns = changed[changed < matrix.shape[1]]
+    users = np.flatnonzero(matrix.tocsc()[:, columns].getnnz(axis=1))
+    related = np.flatnonzero(matrix[users].getnnz(axis=0))
+    stored = []
+    for start in range(0, len(changed), BATCH_SIZE):
+        stored.extend(
+            RecipeSimilarity.objects.filter(
+                similar_id__in=changed[start:start + BATCH_SIZE].tolist()
+            ).values_list('recipe_id', flat=True).distinct()
+        )
+    return np.union1d(np.union1d(changed, related), stored)
+
+
+def refresh(full=False, top=20, chunk_size=1000, max_user_favorites=1000):
+    """Пересчитывает соседей рецептов.
+
+    Возвращает число пересчитанных рецептов и признак полного пересчёта.
+    Без ``full`` пересчитываются только рецепты, затронутые изменениями
+    из журнала с прошлого запуска. Если журнал недоступен, пересчёт
+    полный.
+    """
+    number = favorite_changes.last()
+    changed = None
+    if not full:
+        changed = favorite_changes.since(cache.get(APPLIED_KEY), number)
+    matrix = load_favorites(max_user_favorites)
+    if changed is None:
+        recipe_ids = np.flatnonzero(matrix.getnnz(axis=0))
+    else:
+        recipe_ids = affected(matrix, changed)
+    normalized, by_recipe = normalize(matrix)
+    recipe_ids = recipe_ids.tolist()
+    for start in range(0, len(recipe_ids), chunk_size):
+        store(neighbours(
+            normalized, by_recipe, recipe_ids[start:start + chunk_size], top
+        ))
+    if changed is None:
+        stale = np.setdiff1d(
+            np.fromiter(
+                RecipeSimilarity.objects.values_list(
+                    'recipe_id', flat=True
+                ).distinct().iterator(),
+                dtype=np.int64,
+            ),
+            recipe_ids,
+        ).tolist()
+        for start in range(0, len(stale), BATCH_SIZE):
+            RecipeSimilarity.objects.filter(
+                recipe_id__in=stale[start:start + BATCH_SIZE]
+            ).delete()
+    cache.set(APPLIED_KEY, number, timeout=None)
+    return len(recipe_ids), changed is None
+
+
+def similar_recipe_ids(recipe_id, limit):
+    return list(
+        RecipeSimilarity.objects.filter(recipe_id=recipe_id)
+        .order_by('-score', '-similar_id')
+        .values_list('similar_id', flat=True)[:limit]
+    )
+
+
+def recommended_recipe_ids(user, limit):
+    """Рекомендации по сумме сходства с последними избранными рецептами.
+
+    Рецепты, которые уже в избранном, не предлагаются.
+    """
+    favorites = Favorite.objects.filter(user=user)
+    recent = list(
+        favorites.order_by('-id')
+        .values_list('recipe_id', flat=True)[:RECENT_FAVORITES]
+    )
+    if not recent:
+        return []
+    return list(
+        RecipeSimilarity.objects.filter(recipe_id__in=recent)
+        .exclude(similar_id__in=favorites.values('recipe_id'))
+        .values('similar_id')
+        .annotate(total=Sum('score'))
+        .order_by('-total', '-similar_id')
+        .values_list('similar_id', flat=True)[:limit]
+    )
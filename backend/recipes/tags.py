@@ -0,0 +1,43 @@
+import threading
+
+from django.db.models import Exists, OuterRef
+
+from recipes.models import Tag, TagsInRecipe
+from recipes.versions import get_version
+
+
+class TagMap:
+    """Соответствие slug -> id тегов в памяти воркера.
+
+    Перестраивается, когда меняется версия ``tags``.
+    """
+
+    def __init__(self):
+        self._snapshot = (None, {})
+        self._lock = threading.Lock()
+
+    def ids(self, slugs):
+        version, mapping = self._snapshot
+        if version != get_version('tags'):
+            with self._lock:
+                version = get_version('tags')
+                mapping = dict(Tag.objects.values_list('slug', 'id'))
+                self._snapshot = (version, mapping)
+        return [mapping[slug] for slug in slugs if slug in mapping]
+
+
+tag_map = TagMap()
+
+
+def filter_by_tags(queryset, slugs):
+    """Рецепты хотя бы с одним из тегов ``slugs``, без JOIN и DISTINCT.
+
+    Полусоединение EXISTS с ``TagsInRecipe`` проверяется по индексу
+    ``(tag, recipe)``.
+    """
+    tag_ids = tag_map.ids(slugs)
+    if not tag_ids:
+        return queryset.none()
+    return queryset.filter(Exists(
+        TagsInRecipe.objects.filter(recipe=OuterRef('pk'), tag_id__in=tag_ids)
+    ))
@@ -0,0 +1,46 @@
+"""Фоновый поток воркера для работы, которая не должна задерживать ответ.
+
+Задачи выполняются по одной, в порядке постановки. Очередь живёт в памяти
+процесса: задачи, не выполненные до перезапуска воркера, теряются; их
+результат восстанавливают команды ``build_image_derivatives`` и
+``rebuild_feed``.
+"""
+import logging
+import queue
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _work():
+    while True:
+        function, args = _queue.get()
+        # У потока своё соединение с базой: закрываем его, если оно
+        # устарело или оборвалось, как это делает Django между запросами.
+        close_old_connections()
+        try:
+            function(*args)
+        except Exception:
+            logger.exception(
+                'Фоновая задача %s%r не выполнена', function.__name__, args
+            )
+        finally:
+            _queue.task_done()
+
+
+def schedule(function, *args):
+    """Ставит вызов ``function(*args)`` в очередь фонового потока."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_work, name='recipe-tasks', daemon=True
+            )
+            _worker.start()
+    _queue.put((function, args))
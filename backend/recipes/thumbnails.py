@@ -0,0 +1,87 @@
+import os
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from recipes.metrics import registry
+from recipes.models import Recipe
+from recipes.tasks import schedule
+from recipes.versions import bump_version, recipe_families
+
+PROCESSING_TIME = registry.histogram(
+    'recipe_image_processing_seconds', 'Время построения копий изображения'
+)
+
+
+def derivative_name(name, size):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{size}.{settings.RECIPE_IMAGE_FORMAT.lower()}'
+
+
+def derivatives_ready(recipe):
+    # Отметку ставит build_derivatives: хранилище не опрашивается.
+    return bool(recipe.image) and recipe.image_derivatives == recipe.image.name
+
+
+def derivative_urls(recipe):
+    """Ссылки на уменьшенные копии или на оригинал, пока их нет."""
+    name = recipe.image.name
+    sizes = settings.RECIPE_IMAGE_SIZES
+    if not derivatives_ready(recipe):
+        url = default_storage.url(name)
+        return {size: url for size in sizes}
+    return {
+        size: default_storage.url(derivative_name(name, size))
+        for size in sizes
+    }
+
+
+def build_derivatives(name):
+    """Сохраняет копии изображения, вписанные в RECIPE_IMAGE_SIZES.
+
+    Рецептам с этим изображением ставится отметка о готовых копиях, а их
+    метки версий обновляются: ETag и закешированные списки до этого
+    отдавали ссылки на оригинал.
+    """
+    image_format = settings.RECIPE_IMAGE_FORMAT
+    started = time.perf_counter()
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGB' if image_format == 'JPEG' else 'RGBA')
+    for size, bounds in settings.RECIPE_IMAGE_SIZES.items():
+        derivative = image.copy()
+        derivative.thumbnail(bounds, Image.LANCZOS)
+        buffer = BytesIO()
+        derivative.save(
+            buffer,
+            image_format,
+            quality=settings.RECIPE_IMAGE_QUALITY,
+            optimize=True,
+        )
+        path = derivative_name(name, size)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        default_storage.save(path, ContentFile(buffer.getvalue()))
+    recipes = Recipe.objects.filter(image=name)
+    recipe_ids = list(recipes.values_list('id', flat=True))
+    recipes.update(image_derivatives=name)
+    for recipe_id in recipe_ids:
+        bump_version(*recipe_families(recipe_id))
+    PROCESSING_TIME.observe(time.perf_counter() - started)
+
+
+def schedule_derivatives(name):
+    """Ставит изображение в очередь фонового потока воркера.
+
+    При RECIPE_IMAGE_SYNC копии строятся сразу, в текущем потоке.
+    """
+    if settings.RECIPE_IMAGE_SYNC:
+        build_derivatives(name)
+        return
+    schedule(build_derivatives, name)
@@ -0,0 +1,57 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import Recipe, Tag
+
+
+def _key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    """Метка последнего изменения данных ``name``.
+
+    Метка хранится в кеше Django и общая для воркеров, только если общий
+    сам кеш. С LocMemCache у каждого процесса свои метки, поэтому
+    настройки не допускают его при нескольких воркерах.
+    """
+    return cache.get_or_set(_key(name), time.time, timeout=None)
+
+
+def get_versions(names):
+    """Метки для нескольких ``names`` за одно обращение к кешу."""
+    keys = {_key(name): name for name in names}
+    stamps = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in stamps}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        stamps.update(missing)
+    return [stamps[key] for key in keys]
+
+
+def recipe_families(recipe_id, tag_ids=()):
+    """Метки рецепта и семейств списков, в которые он попадает."""
+    rows = Recipe.objects.filter(pk=recipe_id).values_list(
+        'author_id', 'tags__slug'
+    )
+    names = {f'recipe:{recipe_id}', 'recipes:all'}
+    for author_id, slug in rows:
+        names.add(f'recipes:author:{author_id}')
+        if slug:
+            names.add(f'recipes:tag:{slug}')
+    if tag_ids:
+        names.update(
+            f'recipes:tag:{slug}' for slug in
+            Tag.objects.filter(pk__in=tag_ids).values_list('slug', flat=True)
+        )
+    return names
+
+
+def bump_version(*names):
+    """Обновляет метки после фиксации текущей транзакции."""
+    def bump():
+        now = time.time()
+        cache.set_many({_key(name): now for name in names}, timeout=None)
+    transaction.on_commit(bump)
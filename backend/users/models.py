@@ -39,12 +39,30 @@ class User(AbstractUser):
     password = models.CharField(
         _('password'), max_length=settings.USER_NAME_MAX_LENGTH
     )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов', default=0, editable=False
+    )
+
+    # Обновляется отдельными UPDATE из сигналов.
+    DENORMALIZED_FIELDS = ('recipes_count',)
 
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('username',)
 
+    def save(self, *args, **kwargs):
+        # Как и Recipe.save: полное сохранение загруженного ранее
+        # экземпляра не должно затирать счётчик устаревшим значением.
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     """Follow user to author model"""
@@ -75,6 +93,11 @@ class Follow(models.Model):
                 fields=('user', 'author'), name='unique_follower'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('author', 'user'), name='follow_author_user_idx'
+            ),
+        )
 
     def __str__(self):
         return f'Подписка {self.user} на {self.author}'
@@ -32,6 +32,8 @@ class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         if user.is_anonymous:
             return False
@@ -49,22 +51,38 @@ class CustomUserSerializer(UserSerializer):
         )
 
 
+def get_recipes_limit(request):
+    try:
+        return max(int(request.GET['recipes_limit']), 0)
+    except (MultiValueDictKeyError, ValueError):
+        return None
+
+
 class SubscriptionSerializer(CustomUserSerializer):
+    """Автор с его последними рецептами.
+
+    Если в контексте есть ``recipes_by_author`` (см.
+    ``RecipeQuerySet.latest_by_author``), рецепты берутся оттуда, иначе
+    запрашиваются для каждого автора отдельно.
+    """
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
 
     def get_recipes(self, obj):
-        author_recipes = obj.recipes.all()
-        try:
-            recipes_limit = self.context.get('request').GET['recipes_limit']
-            author_recipes = author_recipes[: int(recipes_limit)]
-        except (MultiValueDictKeyError, ValueError):
-            pass
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is not None:
+            author_recipes = recipes_by_author.get(obj.pk, [])
+        else:
+            author_recipes = obj.recipes.minified()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                author_recipes = author_recipes[:recipes_limit]
 
         if author_recipes:
             serializer = get_recipe_serializer()(
                 author_recipes,
                 many=True,
+                context=self.context,
             )
             return serializer.data
 
@@ -72,7 +90,7 @@ class SubscriptionSerializer(CustomUserSerializer):
 
     @staticmethod
     def get_recipes_count(obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     class Meta:
         model = User
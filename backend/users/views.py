@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, Value
 from djoser.views import UserViewSet
 from rest_framework import exceptions, status
 from rest_framework.decorators import action
@@ -6,7 +7,8 @@ from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 
 from api.pagination import PageLimitPagination
-from users.serializers import SubscriptionSerializer
+from recipes.models import Recipe
+from users.serializers import SubscriptionSerializer, get_recipes_limit
 from rest_framework.response import Response
 
 User = get_user_model()
@@ -42,10 +44,15 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         authors = self.request.user.follower.values('author__id')
-        queryset = User.objects.filter(pk__in=authors)
-        serializer = self.get_serializer(
-            self.paginate_queryset(queryset), many=True
+        queryset = User.objects.filter(pk__in=authors).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
         )
+        page = self.paginate_queryset(queryset)
+        context = self.get_serializer_context()
+        context['recipes_by_author'] = Recipe.objects.latest_by_author(
+            [author.pk for author in page], get_recipes_limit(request)
+        )
+        serializer = self.get_serializer(page, many=True, context=context)
 
         return self.get_paginated_response(serializer.data)
 